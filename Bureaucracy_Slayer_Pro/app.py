@@ -1,3 +1,5 @@
+from __future__ import annotations
+
 import streamlit as st
 import os
 import sys
@@ -9,23 +11,34 @@ import hashlib
 import functools
 import platform
 import atexit
+import asyncio
+import threading
+import contextvars
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Set, Tuple, Any, TYPE_CHECKING
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from difflib import SequenceMatcher
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
 import logging
 import time
+import unicodedata
 
-import pytesseract
-from PIL import Image
-from openai import OpenAI, APIError
-import docx
 import fitz  # PyMuPDF
 
+# Τα pytesseract, openai και docx φορτώνονται μόνο όταν χρειαστούν
+if TYPE_CHECKING:
+    import numpy as np
+    from openai import OpenAI, AsyncOpenAI
+
 # ═══════════════════════════════════════════════════════════════
 # 🔧 AUTO-DETECT TESSERACT PATH (Cross-platform)
 # ═══════════════════════════════════════════════════════════════
+# Το OCR τρέχει έναν Tesseract ανά πυρήνα (_ocr_pages), οπότε κάθε διεργασία του χωρίς δικά της OpenMP
+# threads - αλλιώς το μηχάνημα υπερφορτώνεται. Μία φορά στην εκκίνηση, επειδή το pytesseract δεν δέχεται
+# env ανά κλήση και κληρονομεί το environment της διεργασίας. Μια ρητή τιμή του χρήστη μένει.
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
 def find_tesseract():
     """Αυτόματος εντοπισμός Tesseract σε Windows/Linux/Mac"""
     system = platform.system()
@@ -42,22 +55,35 @@ def find_tesseract():
                 return expanded_path
     else:
         # Linux/Mac - ψάξε στο PATH
-        import shutil as sh
-        tesseract_path = sh.which('tesseract')
+        tesseract_path = shutil.which('tesseract')
         if tesseract_path:
             return tesseract_path
     
     return None
 
-tesseract_path = find_tesseract()
-if tesseract_path:
-    pytesseract.pytesseract.tesseract_cmd = tesseract_path
-else:
-    st.warning("⚠️ Tesseract OCR δεν βρέθηκε. Τα scanned PDFs ενδέχεται να μην λειτουργούν.")
+@st.cache_resource(show_spinner=False)
+def _load_pytesseract() -> Tuple[Any, Optional[str]]:
+    """Import του pytesseract και εντοπισμός του Tesseract - μία φορά ανά διεργασία"""
+    import pytesseract
+    tesseract_path = find_tesseract()
+    if tesseract_path:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_path
+    else:
+        logger.warning("Tesseract OCR not found")
+    return pytesseract, tesseract_path
+
+def get_pytesseract():
+    """Lazy πρόσβαση στο pytesseract - μόνο τα scanned έγγραφα πληρώνουν το κόστος"""
+    return _load_pytesseract()[0]
+
+def warn_if_tesseract_missing():
+    if _load_pytesseract()[1] is None:
+        st.warning("⚠️ Tesseract OCR δεν βρέθηκε. Τα scanned PDFs ενδέχεται να μην λειτουργούν.")
 
 # ═══════════════════════════════════════════════════════════════
 # 🔤 GREEK FONT DETECTION
 # ═══════════════════════════════════════════════════════════════
+@st.cache_resource(show_spinner=False)
 def get_greek_font_path() -> Optional[str]:
     """Εντοπίζει μια γραμματοσειρά στο σύστημα που υποστηρίζει Ελληνικά."""
     system = platform.system()
@@ -89,6 +115,12 @@ def get_greek_font_path() -> Optional[str]:
             
     return None
 
+@st.cache_resource(show_spinner=False)
+def load_greek_font() -> Optional[bytes]:
+    """Τα bytes της ελληνικής γραμματοσειράς - διαβάζονται μία φορά ανά διεργασία"""
+    path = get_greek_font_path()
+    return Path(path).read_bytes() if path else None
+
 # ═══════════════════════════════════════════════════════════════
 # 📝 LOGGING CONFIGURATION
 # ═══════════════════════════════════════════════════════════════
@@ -102,10 +134,14 @@ logger = logging.getLogger(__name__)
 class Config:
     LM_STUDIO_URL: str = field(default="http://localhost:1234/v1")
     MODEL_NAME: str = field(default="mistral-nemo-instruct")
-    OCR_DPI: int = field(default=300)
+    EMBEDDING_MODEL: str = field(default="text-embedding-nomic-embed-text-v1.5")
+    OCR_DPI_FAST: int = field(default=200)
+    OCR_DPI_RETRY: int = field(default=300)
+    OCR_MIN_CONFIDENCE: float = field(default=60.0)
     MAX_FILE_SIZE_MB: int = field(default=50)
     TEMP_DIR: Path = field(default_factory=lambda: Path(tempfile.gettempdir()) / "bureaucracy_slayer")
     MAX_TEXT_LENGTH: int = field(default=8000)
+    TEXT_PREVIEW_CHARS: int = field(default=5000)
     
     # Persistent storage paths
     DATA_DIR: Path = field(default_factory=lambda: Path.home() / ".bureaucracy_slayer")
@@ -124,6 +160,45 @@ def get_config() -> Config:
 
 CONFIG = get_config()
 
+# ═══════════════════════════════════════════════════════════════
+# 🔤 PRECOMPILED PATTERNS
+# ═══════════════════════════════════════════════════════════════
+_RE_FENCE = re.compile(r'```(?:json)?\s*')
+_RE_QUOTED = re.compile(r'"([^"]+)"')
+_RE_GREEK_FIELD = re.compile(r'([Α-ΩΆΈΉΊΌΎΏα-ωάέήίόύώ\s\.]+?)(?:[…\.:]+|(?:\s*…………))', re.MULTILINE)
+_RE_PLACEHOLDER_ONLY = re.compile(r'^[\.\[\]\_]+$')
+_STRIP_BRACKETS = str.maketrans('', '', '[]')
+_RE_INLINE_SPACE = re.compile(r'[ \t\u00a0]+')
+_RE_LEADER = re.compile(r'([\._…])\1{3,}')
+_RE_PAGE_MARKER = re.compile(r'^--- Σελίδα \d+ ---$')
+_RE_PAGE_SPLIT = re.compile(r'^--- Σελίδα \d+ ---$', re.MULTILINE)
+
+@functools.lru_cache(maxsize=4096)
+def _fold_char(ch: str) -> str:
+    """Χαρακτήρας χωρίς τόνους (και πολυτονικά) και πεζός - 'Ό' -> 'ο', 'ΐ' -> 'ι'"""
+    return ''.join(c for c in unicodedata.normalize('NFD', ch) if not unicodedata.combining(c)).casefold()
+
+class _FoldTable(dict):
+    """Πίνακας για str.translate που γεμίζει σταδιακά, έναν χαρακτήρα τη φορά"""
+    def __missing__(self, code: int) -> str:
+        self[code] = folded = _fold_char(chr(code))
+        return folded
+
+_FOLD_TABLE = _FoldTable()
+
+def _fold_text(text: str) -> str:
+    """Κανονικοποίηση για σύγκριση Ελληνικών: "ΕΠΩΝΥΜΟ", "Επώνυμο" και "επωνυμο" γίνονται ίδια"""
+    return text.translate(_FOLD_TABLE)
+
+class _SafeKeyTable(dict):
+    """Πίνακας για str.translate: γράμματα (και Ελληνικά), ψηφία και '_' μένουν, όλα τα άλλα γίνονται '_'"""
+    def __missing__(self, code: int) -> str:
+        ch = chr(code)
+        self[code] = safe = ch if ch.isalnum() or ch == '_' else '_'
+        return safe
+
+_SAFE_KEY_TABLE = _SafeKeyTable()
+
 # ═══════════════════════════════════════════════════════════════
 # 🧹 TEMP FILE CLEANUP
 # ═══════════════════════════════════════════════════════════════
@@ -132,25 +207,25 @@ def cleanup_temp_files():
     try:
         temp_dir = CONFIG.TEMP_DIR
         if temp_dir.exists():
-            # Διαγραφή μόνο των προσωρινών αρχείων, όχι του ίδιου του φακέλου
-            for f in temp_dir.glob("preview_page_*.png"):
-                try:
-                    f.unlink(missing_ok=True)
-                    logger.info(f"Cleaned up: {f}")
-                except Exception as e:
-                    logger.warning(f"Could not delete {f}: {e}")
-            
-            # Διαγραφή παλιών filled PDFs (παλαιότερα από 1 ώρα)
-            current_time = datetime.now()
-            for f in temp_dir.glob("filled_*.pdf"):
-                try:
-                    file_stat = f.stat()
-                    file_age = current_time - datetime.fromtimestamp(file_stat.st_mtime)
-                    if file_age > timedelta(hours=1):
-                        f.unlink(missing_ok=True)
-                        logger.info(f"Cleaned up old PDF: {f}")
-                except Exception as e:
-                    logger.warning(f"Could not delete {f}: {e}")
+            # Ένα πέρασμα στον φάκελο - διαγραφή μόνο των προσωρινών αρχείων, όχι του ίδιου του φακέλου
+            cutoff = time.time() - 3600
+            with os.scandir(temp_dir) as it:
+                for entry in it:
+                    name = entry.name
+                    try:
+                        # Υπολείμματα OCR batches (σελίδες PNG και manifests)
+                        if name.startswith("ocr_batch_"):
+                            os.unlink(entry.path)
+                            logger.info(f"Cleaned up: {entry.path}")
+                        # Παλιά filled PDFs (παλαιότερα από 1 ώρα)
+                        elif name.startswith("filled_") and name.endswith(".pdf"):
+                            if entry.stat().st_mtime < cutoff:
+                                os.unlink(entry.path)
+                                logger.info(f"Cleaned up old PDF: {entry.path}")
+                    except FileNotFoundError:
+                        pass
+                    except Exception as e:
+                        logger.warning(f"Could not delete {entry.path}: {e}")
     except Exception as e:
         logger.error(f"Cleanup error: {e}")
 
@@ -160,19 +235,32 @@ atexit.register(cleanup_temp_files)
 # ═══════════════════════════════════════════════════════════════
 # 💾 USER PROFILE PERSISTENCE
 # ═══════════════════════════════════════════════════════════════
+@st.cache_resource
+def _profile_memo() -> Dict[str, Any]:
+    """Parsed προφίλ και mtime του αρχείου - ζει στη μνήμη της διεργασίας, πέρα από τα reruns"""
+    return {'mtime': None, 'profile': {}}
+
 class UserProfileManager:
     """Διαχείριση προφίλ χρήστη με persistent storage"""
     
     @staticmethod
     def load() -> Dict[str, str]:
-        """Φόρτωση προφίλ από αρχείο"""
-        if CONFIG.PROFILE_FILE.exists():
+        """Φόρτωση προφίλ από αρχείο - νέο parse μόνο όταν αλλάξει το mtime"""
+        memo = _profile_memo()
+        try:
+            mtime = CONFIG.PROFILE_FILE.stat().st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        
+        if mtime != memo['mtime']:
             try:
                 with open(CONFIG.PROFILE_FILE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                    memo['profile'] = json.load(f)
+                memo['mtime'] = mtime
             except Exception as e:
                 logger.warning(f"Failed to load profile: {e}")
-        return {}
+                return {}
+        return dict(memo['profile'])
     
     @staticmethod
     def save(profile: Dict[str, str]) -> bool:
@@ -180,6 +268,9 @@ class UserProfileManager:
         try:
             with open(CONFIG.PROFILE_FILE, 'w', encoding='utf-8') as f:
                 json.dump(profile, f, ensure_ascii=False, indent=2)
+            memo = _profile_memo()
+            memo['profile'] = dict(profile)
+            memo['mtime'] = CONFIG.PROFILE_FILE.stat().st_mtime_ns
             return True
         except Exception as e:
             logger.error(f"Failed to save profile: {e}")
@@ -196,7 +287,7 @@ st.set_page_config(
 )
 
 # Custom CSS για modern UI
-st.markdown("""
+_CSS = """
 <style>
     /* Main container */
     .main { background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); }
@@ -403,52 +494,451 @@ st.markdown("""
         border-color: #4caf50;
         opacity: 0.7;
     }
+    .page-thumb.empty {
+        border-color: #ff9800;
+        background: #fff3e0;
+    }
+    .page-thumb.failed {
+        border-color: #e53935;
+        background: #ffebee;
+    }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Χωρίς σχόλια και indentation: μικρότερο payload σε κάθε rerun
+_CSS = re.sub(r'\s+', ' ', re.sub(r'/\*.*?\*/', '', _CSS, flags=re.S)).strip()
+
+# Το CSS στέλνεται σε κάθε rerun: ό,τι δεν ξαναγράφεται στο rerun αφαιρείται από τη σελίδα
+st.markdown(_CSS, unsafe_allow_html=True)
 
-@functools.lru_cache(maxsize=128)
 def compute_file_hash(file_content: bytes) -> str:
     return hashlib.sha256(file_content).hexdigest()[:16]
 
+# ═══════════════════════════════════════════════════════════════
+# 🗄️ RESPONSE CACHE
+# ═══════════════════════════════════════════════════════════════
+# Αύξησε το CACHE_VERSION όταν αλλάζουν prompts ή μορφή αποτελεσμάτων
+CACHE_VERSION = 2
+
+@st.cache_resource
+def _memory_cache_store() -> Dict[str, OrderedDict]:
+    """Κοινό in-memory tier για όλα τα caches - επιβιώνει τα Streamlit reruns"""
+    return {}
+
+_HASH_MEMO_MAX_ENTRIES = 256
+
+def _file_hash_memo_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"{path}|{stat.st_mtime_ns}|{stat.st_size}"
+
+def remember_file_hash(path: str, file_hash: str):
+    """Καταχώρηση hash που υπολογίστηκε ήδη (π.χ. κατά το γράψιμο) - χωρίς νέο διάβασμα του αρχείου"""
+    memo = _memory_cache_store().setdefault("file_hash", OrderedDict())
+    memo[_file_hash_memo_key(path)] = file_hash
+    while len(memo) > _HASH_MEMO_MAX_ENTRIES:
+        memo.popitem(last=False)
+
+def compute_file_hash_path(path: str) -> str:
+    """Hash αρχείου από το δίσκο - streaming, με memo ανά (path, mtime, size)"""
+    key = _file_hash_memo_key(path)
+    memo = _memory_cache_store().setdefault("file_hash", OrderedDict())
+    if key in memo:
+        memo.move_to_end(key)
+        return memo[key]
+    
+    with open(path, 'rb') as f:
+        if hasattr(hashlib, 'file_digest'):
+            digest = hashlib.file_digest(f, 'sha256')
+        else:
+            # Python < 3.11
+            digest = hashlib.sha256()
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    file_hash = digest.hexdigest()[:16]
+    
+    remember_file_hash(path, file_hash)
+    return file_hash
+
+class JsonFileCache:
+    """Cache σε JSON αρχεία με LRU in-memory tier μπροστά από το δίσκο"""
+    
+    def __init__(self, directory: Path, fingerprint: str, max_memory_entries: int = 64,
+                 max_disk_bytes: Optional[int] = None, ttl_seconds: Optional[float] = None):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+    
+    @property
+    def _memory(self) -> OrderedDict:
+        return _memory_cache_store().setdefault(f"{self.directory}|{self.fingerprint}", OrderedDict())
+    
+    def _remember(self, key: str, value: Any, created: float):
+        memory = self._memory
+        memory[key] = (created, value)
+        memory.move_to_end(key)
+        while len(memory) > self.max_memory_entries:
+            memory.popitem(last=False)
+    
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created > self.ttl_seconds
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Επιστρέφει την τιμή ή None αν δεν υπάρχει έγκυρη εγγραφή"""
+        memory = self._memory
+        if key in memory:
+            created, value = memory[key]
+            if not self._expired(created):
+                memory.move_to_end(key)
+                return value
+            del memory[key]
+        
+        path = self.directory / f"{key}.json"
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except Exception as e:
+            logger.warning(f"Corrupted cache entry {path}, removing: {e}")
+            path.unlink(missing_ok=True)
+            return None
+        
+        # Άλλη έκδοση cache ή άλλο μοντέλο: η εγγραφή δεν ισχύει
+        if entry.get('fingerprint') != self.fingerprint:
+            return None
+        
+        try:
+            created = datetime.fromisoformat(entry['created']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            created = 0.0
+        if self._expired(created):
+            path.unlink(missing_ok=True)
+            return None
+        
+        # Ανανέωση mtime ώστε η LRU εκκαθάριση του δίσκου να κρατάει τις πρόσφατες εγγραφές
+        if self.max_disk_bytes is not None:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        
+        self._remember(key, entry['value'], created)
+        return entry['value']
+    
+    def put(self, key: str, value: Any):
+        """Αποθήκευση στη μνήμη και (atomically) στο δίσκο"""
+        created = datetime.now(timezone.utc)
+        self._remember(key, value, created.timestamp())
+        path = self.directory / f"{key}.json"
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({
+                    'fingerprint': self.fingerprint,
+                    'created': created.isoformat(),
+                    'value': value
+                }, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            logger.warning(f"Could not write cache entry {path}: {e}")
+        
+        if self.max_disk_bytes is not None:
+            self._evict()
+    
+    def _evict(self):
+        """LRU εκκαθάριση με βάση το mtime μέχρι ο φάκελος να χωράει στο max_disk_bytes"""
+        try:
+            with os.scandir(self.directory) as it:
+                entries = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in it if e.name.endswith(".json")]
+        except OSError as e:
+            logger.warning(f"Could not scan cache {self.directory}: {e}")
+            return
+        
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                self._memory.pop(Path(path).stem, None)
+            except OSError as e:
+                logger.warning(f"Could not evict cache entry {path}: {e}")
+
+# Prompts και απαντήσεις περιέχουν δεδομένα από τα έγγραφα: με λήξη και όριο μεγέθους, όπως οι άλλες caches
+LLM_CACHE = JsonFileCache(
+    CONFIG.DATA_DIR / "llm_cache",
+    fingerprint=f"v{CACHE_VERSION}:{CONFIG.MODEL_NAME}",
+    max_disk_bytes=100 * 1024 * 1024,
+    ttl_seconds=86400
+)
+
+# Αύξησε το OCR_CACHE_VERSION όταν αλλάζει η μορφή του OCR κειμένου
+OCR_CACHE_VERSION = 1
+OCR_CACHE = JsonFileCache(
+    CONFIG.DATA_DIR / "ocr_cache",
+    fingerprint=f"v{OCR_CACHE_VERSION}:dpi{CONFIG.OCR_DPI_FAST}-{CONFIG.OCR_DPI_RETRY}:conf{CONFIG.OCR_MIN_CONFIDENCE}",
+    max_memory_entries=16,
+    max_disk_bytes=500 * 1024 * 1024
+)
+
+# Απαντήσεις του FormFiller: προσωπικά δεδομένα, οπότε στο TEMP_DIR και με λήξη
+FORM_CACHE = JsonFileCache(CONFIG.TEMP_DIR / "cache", fingerprint=f"v{CACHE_VERSION}:{CONFIG.MODEL_NAME}", ttl_seconds=86400)
+
+class SemanticCache:
+    """Nearest-neighbour cache πάνω σε embeddings: numpy .npy πίνακας και JSON sidecar με τις εγγραφές"""
+    
+    def __init__(self, directory: Path, fingerprint: str, threshold: float = 0.95,
+                 max_entries: int = 500, ttl_seconds: Optional[float] = None):
+        self.directory = directory
+        self.fingerprint = fingerprint
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.matrix_path = directory / "embeddings.npy"
+        self.entries_path = directory / "entries.json"
+    
+    def _load(self) -> Tuple[Optional[np.ndarray], List[Dict[str, Any]]]:
+        import numpy as np
+        try:
+            with open(self.entries_path, 'r', encoding='utf-8') as f:
+                sidecar = json.load(f)
+            if sidecar.get('fingerprint') != self.fingerprint:
+                return None, []
+            # Στη μνήμη, όχι mmap: ένα ανοιχτό mapping κλειδώνει το αρχείο (Windows) και το os.replace
+            # του add() αποτυγχάνει. Με max_entries γραμμές ο πίνακας είναι λίγα MB
+            matrix = np.load(self.matrix_path)
+        except FileNotFoundError:
+            return None, []
+        except Exception as e:
+            logger.warning(f"Corrupted semantic cache {self.directory}, ignoring: {e}")
+            return None, []
+        
+        entries = sidecar.get('entries', [])
+        if matrix.ndim != 2 or matrix.shape[0] != len(entries):
+            return None, []
+        return matrix, entries
+    
+    def _expired(self, entry: Dict[str, Any]) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry.get('created', 0.0) > self.ttl_seconds
+    
+    def nearest(self, vector: List[float]) -> Optional[Dict[str, Any]]:
+        """Η πιο κοντινή εγγραφή αν η cosine similarity ξεπερνά το threshold"""
+        import numpy as np
+        matrix, entries = self._load()
+        if matrix is None or not entries:
+            return None
+        
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != matrix.shape[1]:
+            return None
+        
+        # Οι ληγμένες εγγραφές (προσωπικά δεδομένα) φεύγουν και από το δίσκο, πριν την αναζήτηση
+        valid = [i for i, e in enumerate(entries) if not self._expired(e)]
+        if len(valid) < len(entries):
+            matrix, entries = matrix[valid], [entries[i] for i in valid]
+            self._write(matrix, entries)
+            if not entries:
+                return None
+        
+        # Οι γραμμές αποθηκεύονται κανονικοποιημένες: το dot product είναι η cosine similarity
+        sims = matrix @ (query / norm)
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+        logger.info(f"🔎 Semantic cache candidate: similarity {sims[best]:.3f}")
+        return entries[best]
+    
+    def add(self, vector: List[float], entry: Dict[str, Any]):
+        """Προσθήκη εγγραφής - οι ληγμένες και οι παλαιότερες πέρα από το max_entries φεύγουν"""
+        import numpy as np
+        query = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return
+        
+        matrix, entries = self._load()
+        if matrix is None or matrix.shape[1] != query.shape[0]:
+            matrix, entries = np.empty((0, query.shape[0]), dtype=np.float32), []
+        keep = [i for i, e in enumerate(entries) if not self._expired(e)][-(self.max_entries - 1):]
+        self._write(
+            np.vstack([matrix[keep], query / norm]),
+            [entries[i] for i in keep] + [{**entry, 'created': time.time()}]
+        )
+    
+    def _write(self, matrix: "np.ndarray", entries: List[Dict[str, Any]]):
+        """Atomic αντικατάσταση πίνακα και sidecar"""
+        import numpy as np
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True, mode=0o700)
+            tmp_matrix = self.matrix_path.with_suffix(".tmp")
+            with open(tmp_matrix, 'wb') as f:
+                np.save(f, np.asarray(matrix, dtype=np.float32))
+            tmp_entries = self.entries_path.with_suffix(".tmp")
+            with open(tmp_entries, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self.fingerprint, 'entries': entries}, f, ensure_ascii=False)
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_entries, self.entries_path)
+        except Exception as e:
+            logger.warning(f"Could not write semantic cache {self.directory}: {e}")
+
+SEMANTIC_FORM_CACHE = SemanticCache(
+    CONFIG.TEMP_DIR / "cache" / "semantic",
+    fingerprint=f"v{CACHE_VERSION}:{CONFIG.MODEL_NAME}:{CONFIG.EMBEDDING_MODEL}",
+    ttl_seconds=86400
+)
+
 # ═══════════════════════════════════════════════════════════════
 # 🤖 AI CLIENT MANAGER
 # ═══════════════════════════════════════════════════════════════
+@st.cache_resource
+def _ai_client_store() -> Dict[str, Any]:
+    """Sync client και αποτέλεσμα του τελευταίου probe - επιβιώνουν τα Streamlit reruns"""
+    return {'client': None, 'connected': False, 'last_error': None, 'last_probe': 0.0, 'lock': threading.Lock()}
+
 class AIClientManager:
-    _instance: Optional[OpenAI] = None
-    _last_error: Optional[str] = None
-    _connected: bool = False
+    # Το probe (models.list) ξανατρέχει μόνο μετά το TTL - πιο σύντομα αν η σύνδεση απέτυχε
+    _PROBE_TTL: float = 30.0
+    _PROBE_TTL_FAILED: float = 5.0
     
     @classmethod
-    def get_client(cls) -> Optional[OpenAI]:
-        if cls._instance is None:
-            try:
-                cls._instance = OpenAI(base_url=CONFIG.LM_STUDIO_URL, api_key="lm-studio", timeout=240.0)
-                # Test connection
-                cls._instance.models.list()
-                cls._connected = True
+    def _probe(cls, state: Dict[str, Any]):
+        try:
+            state['client'].models.list()
+            if not state['connected']:
                 logger.info("✅ Connected to LM Studio")
-            except Exception as e:
-                cls._last_error = str(e)
-                cls._connected = False
-                logger.warning(f"❌ Could not connect to LM Studio: {e}")
-                return None
-        return cls._instance
+            state['connected'] = True
+            state['last_error'] = None
+        except Exception as e:
+            state['last_error'] = str(e)
+            state['connected'] = False
+            logger.warning(f"❌ Could not connect to LM Studio: {e}")
+        state['last_probe'] = time.time()
+    
+    @classmethod
+    def get_client(cls) -> Optional[OpenAI]:
+        state = _ai_client_store()
+        # Lock: το warmup thread και τα sessions δεν κάνουν probe ταυτόχρονα
+        with state['lock']:
+            if state['client'] is None:
+                from openai import OpenAI
+                state['client'] = OpenAI(base_url=CONFIG.LM_STUDIO_URL, api_key="lm-studio", timeout=240.0)
+            
+            ttl = cls._PROBE_TTL if state['connected'] else cls._PROBE_TTL_FAILED
+            if time.time() - state['last_probe'] >= ttl:
+                cls._probe(state)
+            return state['client'] if state['connected'] else None
+    
+    @classmethod
+    def get_async_client(cls) -> Optional[AsyncOpenAI]:
+        """AsyncOpenAI client του τρέχοντος run_llm - το connection pool δένεται στο loop του run
+        και κλείνει στο τέλος του, οπότε κανένας client δεν μοιράζεται μεταξύ sessions/loops"""
+        if cls.get_client() is None:
+            return None
+        run_state = _llm_run_state()
+        if run_state['client'] is None:
+            from openai import AsyncOpenAI
+            run_state['client'] = AsyncOpenAI(base_url=CONFIG.LM_STUDIO_URL, api_key="lm-studio", timeout=240.0)
+        return run_state['client']
     
     @classmethod
     def is_connected(cls) -> bool:
-        if cls._instance is None:
-            cls.get_client()
-        return cls._connected
+        return cls.get_client() is not None
     
     @classmethod
     def get_status(cls) -> Tuple[bool, str]:
         if cls.is_connected():
             return True, "🟢 Συνδεδεμένο με LM Studio"
-        return False, f"🔴 Αποσυνδεδεμένο: {cls._last_error or 'Άγνωστο σφάλμα'}"
+        return False, f"🔴 Αποσυνδεδεμένο: {_ai_client_store()['last_error'] or 'Άγνωστο σφάλμα'}"
+    
+    @classmethod
+    def warmup(cls):
+        """Completion ενός token ώστε το LM Studio να φορτώσει το μοντέλο πριν το πρώτο έγγραφο"""
+        client = cls.get_client()
+        if client is None:
+            return
+        try:
+            client.chat.completions.create(
+                model=CONFIG.MODEL_NAME,
+                messages=[{"role": "user", "content": "ping"}],
+                max_tokens=1
+            )
+            logger.info("✅ LM Studio model warmed up")
+        except Exception as e:
+            logger.warning(f"Model warmup failed: {e}")
 
 def get_ai_client() -> Optional[OpenAI]:
     return AIClientManager.get_client()
 
+def get_async_ai_client() -> Optional[AsyncOpenAI]:
+    return AIClientManager.get_async_client()
+
+# Κατάσταση ανά run: όριο ταυτόχρονων κλήσεων προς το LM Studio και ο async client.
+# Και τα δύο δένονται στο event loop όπου χρησιμοποιούνται, και κάθε asyncio.run (ανά session thread)
+# φτιάχνει νέο loop - οπότε ένα dict ανά run, μέσω contextvar που κληρονομούν και τα tasks του
+# asyncio.gather (το dict είναι κοινό, άρα ένας client που φτιάχνει ένα task τον βλέπουν όλα)
+_LLM_MAX_CONCURRENCY = 4
+_LLM_RUN: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar('llm_run', default=None)
+
+def _new_llm_run_state() -> Dict[str, Any]:
+    return {'semaphore': asyncio.Semaphore(_LLM_MAX_CONCURRENCY), 'client': None}
+
+def _llm_run_state() -> Dict[str, Any]:
+    """Η κατάσταση του τρέχοντος run - δημιουργείται μέσα στο loop, άρα δουλεύει και σε Python 3.9"""
+    run_state = _LLM_RUN.get()
+    if run_state is None:
+        run_state = _new_llm_run_state()
+        _LLM_RUN.set(run_state)
+    return run_state
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    return _llm_run_state()['semaphore']
+
+def run_llm(coro):
+    """asyncio.run με δικό του semaphore και client για τις κλήσεις LLM - ο client κλείνει στο τέλος"""
+    async def runner():
+        run_state = _new_llm_run_state()
+        _LLM_RUN.set(run_state)
+        try:
+            return await coro
+        finally:
+            if run_state['client'] is not None:
+                await run_state['client'].close()
+    return asyncio.run(runner())
+
+async def _stream_chat(client: AsyncOpenAI, messages: List[Dict[str, str]], placeholder=None, **kwargs) -> str:
+    """Streaming κλήση στο LLM - τα tokens εμφανίζονται στο placeholder καθώς έρχονται"""
+    buffer: List[str] = []
+    last_render = 0.0
+    
+    stream = await client.chat.completions.create(
+        model=CONFIG.MODEL_NAME,
+        messages=messages,
+        stream=True,
+        **kwargs
+    )
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if not delta:
+            continue
+        buffer.append(delta)
+        
+        # Throttle: όχι ένα websocket message ανά token
+        now = time.monotonic()
+        if placeholder is not None and now - last_render > 0.1:
+            placeholder.code("".join(buffer), language="json")
+            last_render = now
+    
+    if placeholder is not None:
+        placeholder.empty()
+    return "".join(buffer)
+
 # ═══════════════════════════════════════════════════════════════
 # 📱 APP STATE MANAGEMENT
 # ═══════════════════════════════════════════════════════════════
@@ -459,6 +949,7 @@ class AppState:
         'dynamic_fields': [],
         'tmp_pdf_path': None,
         'file_hash': None,
+        'upload_id': None,
         'is_pdf': False,
         'form_data': {},
         'filled_pdf_path': None,
@@ -474,6 +965,8 @@ class AppState:
         'agent2_status': 'waiting',
         'processing': False,
         'pdf_preview_pages': [],
+        'filled_pdf_bytes': None,
+        'form_layout': None,
         # Document analysis
         'document_summary': None,
         'critical_info': {},
@@ -517,24 +1010,143 @@ class AppState:
 
 AppState.init()
 
+@st.cache_resource(show_spinner=False)
+def _start_model_warmup() -> threading.Thread:
+    """Warmup του μοντέλου στο background - μία φορά ανά διεργασία"""
+    thread = threading.Thread(target=AIClientManager.warmup, name="lm-studio-warmup", daemon=True)
+    thread.start()
+    return thread
+
+_start_model_warmup()
+
 # ═══════════════════════════════════════════════════════════════
 # 📄 TEXT EXTRACTION WITH PAGE-BY-PAGE PROGRESS
 # ═══════════════════════════════════════════════════════════════
-def extract_text_from_pdf_with_progress(file_path: str, progress_container) -> Tuple[str, bool, int]:
-    """Εξαγωγή κειμένου από PDF με real-time progress per page"""
+def _pages_from_ocr_data(data: Dict[str, list], page_total: int) -> List[Tuple[str, float]]:
+    """Ανασύνθεση κειμένου και μέσου confidence ανά σελίδα από το TSV του Tesseract"""
+    lines: List[Dict[Tuple[int, int, int], List[str]]] = [{} for _ in range(page_total)]
+    confs: List[List[float]] = [[] for _ in range(page_total)]
+    
+    for i, word in enumerate(data.get('text', [])):
+        # level 5 = λέξη
+        if data['level'][i] != 5 or not str(word).strip():
+            continue
+        page_idx = data['page_num'][i] - 1
+        if not 0 <= page_idx < page_total:
+            continue
+        line_key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines[page_idx].setdefault(line_key, []).append(str(word))
+        conf = float(data['conf'][i])
+        if conf >= 0:
+            confs[page_idx].append(conf)
+    
+    pages = []
+    for page_lines, page_confs in zip(lines, confs):
+        text = ""
+        prev_par = None
+        for (block, par, _), words in page_lines.items():
+            if prev_par is not None:
+                text += "\n\n" if (block, par) != prev_par else "\n"
+            text += " ".join(words)
+            prev_par = (block, par)
+        mean_conf = sum(page_confs) / len(page_confs) if page_confs else 0.0
+        pages.append((text, mean_conf))
+    return pages
+
+def _ocr_batch(image_paths: List[str], manifest_path: Path) -> List[Tuple[str, float]]:
+    """OCR πολλών σελίδων με ΜΙΑ κλήση Tesseract (image-list mode: ένα path ανά γραμμή).
+    Επιστρέφει (κείμενο, μέσο confidence) ανά σελίδα."""
+    manifest_path.write_text("\n".join(image_paths) + "\n", encoding='utf-8')
+    pytesseract = get_pytesseract()
+    data = pytesseract.image_to_data(str(manifest_path), lang='ell+eng', output_type=pytesseract.Output.DICT)
+    return _pages_from_ocr_data(data, len(image_paths))
+
+# Matrices rendering για τα DPI του OCR - υπολογίζονται μία φορά
+_OCR_MATRICES = {dpi: fitz.Matrix(dpi / 72, dpi / 72) for dpi in (CONFIG.OCR_DPI_FAST, CONFIG.OCR_DPI_RETRY)}
+
+def _ocr_pages(doc: fitz.Document, page_nums: List[int], dpi: int,
+               batch_id: str) -> Tuple[Dict[int, Tuple[str, float]], Set[int]]:
+    """Rendering των σελίδων σε PNG και OCR σε παράλληλα batches (χωρίς UI).
+    Επιστρέφει τα αποτελέσματα ανά σελίδα και τις σελίδες που απέτυχαν."""
+    dpi_matrix = _OCR_MATRICES.get(dpi) or fitz.Matrix(dpi / 72, dpi / 72)
+    results: Dict[int, Tuple[str, float]] = {}
+    failed: Set[int] = set()
+    batch_files: List[Path] = []
+    
+    try:
+        # Φάση 1: Rendering των σελίδων σε PNG αρχεία για το batch του Tesseract
+        # Grayscale χωρίς alpha: το 1/3 της μνήμης ενός RGB pixmap, ο Tesseract κάνει ούτως ή άλλως binarization
+        rendered: List[Tuple[int, str]] = []
+        for page_num in page_nums:
+            pix = None
+            try:
+                img_path = CONFIG.TEMP_DIR / f"ocr_batch_{batch_id}_{dpi}_{page_num}.png"
+                batch_files.append(img_path)
+                pix = doc[page_num].get_pixmap(matrix=dpi_matrix, colorspace=fitz.csGRAY, alpha=False)
+                pix.save(str(img_path))
+                rendered.append((page_num, str(img_path)))
+            except Exception as e:
+                results[page_num] = (f"[OCR Error: {e}]", 0.0)
+                failed.add(page_num)
+            finally:
+                # Απελευθέρωση του pixmap πριν το render της επόμενης σελίδας, και σε σφάλμα
+                pix = None
+        
+        # Φάση 2: Μία κλήση Tesseract ανά πυρήνα, κάθε μία για ένα συνεχόμενο κομμάτι σελίδων.
+        # Η δουλειά γίνεται σε subprocesses του Tesseract, οπότε αρκούν threads.
+        workers = max(1, min(os.cpu_count() or 1, len(rendered)))
+        chunk_size = -(-len(rendered) // workers) if rendered else 1
+        chunks = [rendered[i:i + chunk_size] for i in range(0, len(rendered), chunk_size)]
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {}
+            for chunk_idx, chunk in enumerate(chunks):
+                manifest_path = CONFIG.TEMP_DIR / f"ocr_batch_{batch_id}_{dpi}_{chunk_idx}.txt"
+                batch_files.append(manifest_path)
+                future = executor.submit(_ocr_batch, [path for _, path in chunk], manifest_path)
+                futures[future] = chunk
+            
+            for future in as_completed(futures):
+                chunk = futures[future]
+                try:
+                    for (page_num, _), page_result in zip(chunk, future.result()):
+                        results[page_num] = page_result
+                except Exception as e:
+                    for page_num, _ in chunk:
+                        results[page_num] = (f"[OCR Error: {e}]", 0.0)
+                        failed.add(page_num)
+    finally:
+        for f in batch_files:
+            f.unlink(missing_ok=True)
+    
+    return results, failed
+
+class IncompleteOCRError(Exception):
+    """OCR με σελίδες σε σφάλμα - το κείμενο χρησιμοποιείται, αλλά δεν μπαίνει σε καμία cache"""
+    def __init__(self, result: Tuple[str, bool, int], failed_pages: int):
+        super().__init__(f"OCR failed on {failed_pages} page(s)")
+        self.result = result
+
+# Μόνο κείμενο: χωρίς images (TEXT_PRESERVE_IMAGES) και χωρίς CID mapping για άγνωστα glyphs
+_NATIVE_TEXT_FLAGS = fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_MEDIABOX_CLIP
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def _extract_text_pure(file_bytes: bytes) -> Tuple[str, bool, int]:
+    """Εξαγωγή κειμένου από PDF (native ή OCR) χωρίς UI - cached με βάση τα bytes του αρχείου"""
     doc = None
     try:
-        doc = fitz.open(file_path)
+        doc = fitz.open(stream=file_bytes, filetype="pdf")
         page_count = len(doc)
         if page_count == 0:
             return "", False, 0
         
         # Πρώτα δοκιμάζουμε native extraction
         full_text = []
-        needs_ocr = False
         
+        # Σειριακά: το PyMuPDF δεν είναι thread-safe, και ένα pool διεργασιών κοστίζει περισσότερο
+        # από την ίδια την εξαγωγή μέχρι και για εκατοντάδες σελίδες
         for i, page in enumerate(doc):
-            text = page.get_text()
+            text = page.get_text("text", flags=_NATIVE_TEXT_FLAGS)
             if text.strip():
                 full_text.append(f"--- Σελίδα {i + 1} ---\n{text}")
         
@@ -545,67 +1157,122 @@ def extract_text_from_pdf_with_progress(file_path: str, progress_container) -> T
         if avg_chars > 30:
             return combined_text, False, page_count
         
-        # Αλλιώς OCR με page-by-page progress
-        needs_ocr = True
-        ocr_text = []
-        dpi_matrix = fitz.Matrix(CONFIG.OCR_DPI/72, CONFIG.OCR_DPI/72)
-        
-        # Create progress UI elements
-        progress_text = progress_container.empty()
-        page_indicators = progress_container.empty()
-        progress_bar = progress_container.progress(0)
-        
-        for page_num, page in enumerate(doc):
-            # Update current page
-            AppState.update_scanning_progress(page_num + 1, page_count, list(range(page_num)))
-            
-            # Show current page scanning
-            progress_text.markdown(f"""
-            <div class="page-scan-box">
-                <h3>📄 Σάρωση Σελίδας {page_num + 1} από {page_count}</h3>
-                <p>🔍 Εκτέλεση OCR...</p>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Update page indicators
-            indicators_html = "<div style='display: flex; flex-wrap: wrap; justify-content: center;'>"
-            for i in range(page_count):
-                if i < page_num:
-                    status = "completed"
-                    icon = "✅"
-                elif i == page_num:
-                    status = "active"
-                    icon = "🔍"
-                else:
-                    status = ""
-                    icon = "⬜"
-                indicators_html += f"<div class='page-thumb {status}' style='width: 60px; margin: 5px;'>{icon}<br>Σελ. {i+1}</div>"
-            indicators_html += "</div>"
-            page_indicators.markdown(indicators_html, unsafe_allow_html=True)
-            
+        # Αλλιώς OCR - πρώτο πέρασμα σε χαμηλότερο DPI, αρκεί για τις περισσότερες καθαρές σαρώσεις
+        batch_id = compute_file_hash(file_bytes)
+        results, failed = _ocr_pages(doc, list(range(page_count)), CONFIG.OCR_DPI_FAST, batch_id)
+        
+        # Επανάληψη σε υψηλότερο DPI μόνο για σελίδες με χαμηλό confidence
+        retry_pages = [p for p, (_, conf) in results.items() if conf < CONFIG.OCR_MIN_CONFIDENCE]
+        if retry_pages:
+            retry_results, retry_failed = _ocr_pages(doc, retry_pages, CONFIG.OCR_DPI_RETRY, batch_id)
+            for page_num, retry_result in retry_results.items():
+                if retry_result[1] >= results[page_num][1]:
+                    results[page_num] = retry_result
+                    if page_num in retry_failed:
+                        failed.add(page_num)
+                    else:
+                        failed.discard(page_num)
+            logger.info(f"OCR: {len(retry_pages)} σελίδες επαναλήφθηκαν σε {CONFIG.OCR_DPI_RETRY} DPI")
+        
+        ocr_text = [f"--- Σελίδα {i + 1} ---\n{results[i][0]}" for i in range(page_count)]
+        result = "\n\n".join(ocr_text), True, page_count
+        if failed:
+            # Exception αντί για return: το st.cache_data δεν κρατάει αποτέλεσμα όταν η συνάρτηση σκάει
+            raise IncompleteOCRError(result, len(failed))
+        return result
+    finally:
+        if doc:
+            doc.close()
+
+def load_ocr_cache(file_hash: str) -> Optional[Tuple[str, bool, int]]:
+    """OCR αποτέλεσμα από προηγούμενη σάρωση του ίδιου αρχείου (και σε προηγούμενο session)"""
+    cached = OCR_CACHE.get(file_hash)
+    if cached is None:
+        return None
+    text, used_ocr, page_count = cached
+    return text, used_ocr, page_count
+
+def save_ocr_cache(file_hash: str, result: Tuple[str, bool, int]):
+    """Αποθήκευση OCR αποτελέσματος στο δίσκο"""
+    OCR_CACHE.put(file_hash, list(result))
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def extract_text_from_image(file_hash: str, _image_path: str) -> str:
+    """OCR εικόνας ανά hash περιεχομένου - το ίδιο αρχείο δεν ξαναπερνά από τον Tesseract"""
+    # Το path πάει κατευθείαν στον Tesseract - χωρίς decode/re-encode μέσω PIL
+    return get_pytesseract().image_to_string(_image_path, lang='ell+eng')
+
+def ocr_page_statuses(text: str) -> List[str]:
+    """'completed', 'empty' ή 'failed' ανά σελίδα του OCR κειμένου (τμήματα '--- Σελίδα N ---')"""
+    statuses = []
+    for body in _RE_PAGE_SPLIT.split(text)[1:]:
+        body = body.strip()
+        if body.startswith("[OCR Error"):
+            statuses.append('failed')
+        elif not body:
+            statuses.append('empty')
+        else:
+            statuses.append('completed')
+    return statuses
+
+def extract_text_from_pdf_with_progress(file_path: str, progress_container) -> Tuple[str, bool, int]:
+    """Εξαγωγή κειμένου από PDF με progress UI - η δουλειά γίνεται στο cached _extract_text_pure"""
+    # Το st.cache_data δεν επιτρέπει γραφή σε UI blocks έξω από την cached συνάρτηση,
+    # οπότε το progress δείχνεται σε επίπεδο εγγράφου και όχι ανά σελίδα
+    progress_text = progress_container.empty()
+    progress_text.markdown("""
+    <div class="page-scan-box">
+        <h3>📄 Σάρωση εγγράφου</h3>
+        <p>🔍 Εξαγωγή κειμένου / OCR σε εξέλιξη...</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    try:
+        # Hash από το δίσκο - σε cache hit το αρχείο δεν φορτώνεται καν στη μνήμη
+        file_hash = compute_file_hash_path(file_path)
+        cached = load_ocr_cache(file_hash)
+        if cached is not None:
+            logger.info(f"♻️ OCR cache hit: {file_hash}")
+            text, needs_ocr, page_count = cached
+        else:
             try:
-                pix = page.get_pixmap(matrix=dpi_matrix)
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                text = pytesseract.image_to_string(img, lang='ell+eng')
-                ocr_text.append(f"--- Σελίδα {page_num + 1} ---\n{text}")
-                pix = None
-            except Exception as e:
-                ocr_text.append(f"--- Σελίδα {page_num + 1} ---\n[OCR Error: {e}]")
-            
-            progress_bar.progress((page_num + 1) / page_count)
-        
-        # Clear progress UI
+                text, needs_ocr, page_count = _extract_text_pure(Path(file_path).read_bytes())
+                # Μόνο το OCR είναι ακριβό - το native κείμενο βγαίνει ξανά σε χιλιοστά
+                if needs_ocr:
+                    save_ocr_cache(file_hash, (text, needs_ocr, page_count))
+            except IncompleteOCRError as e:
+                # Π.χ. χωρίς Tesseract - να ξαναδοκιμαστεί την επόμενη φορά, όχι να σερβίρεται το σφάλμα για πάντα
+                logger.warning(f"{e} - το αποτέλεσμα δεν αποθηκεύεται στην cache")
+                text, needs_ocr, page_count = e.result
+    finally:
         progress_text.empty()
-        page_indicators.empty()
-        progress_bar.empty()
+    
+    if needs_ocr:
+        warn_if_tesseract_missing()
+        # Πραγματική κατάσταση ανά σελίδα από το αποτέλεσμα του OCR (και από την cache)
+        statuses = ocr_page_statuses(text)
+        completed_pages = [i for i, status in enumerate(statuses) if status == 'completed']
+        AppState.update_scanning_progress(page_count, page_count, completed_pages)
         
-        # Show completion
-        progress_container.success(f"✅ Ολοκληρώθηκε η σάρωση {page_count} σελίδων!")
+        icons = {'completed': '✅', 'empty': '⚠️', 'failed': '❌'}
+        indicators_html = "<div style='display: flex; flex-wrap: wrap; justify-content: center;'>"
+        for i, status in enumerate(statuses):
+            indicators_html += f"<div class='page-thumb {status}' style='width: 60px; margin: 5px;'>{icons[status]}<br>Σελ. {i+1}</div>"
+        indicators_html += "</div>"
+        progress_container.markdown(indicators_html, unsafe_allow_html=True)
         
-        return "\n\n".join(ocr_text), True, page_count
-    finally:
-        if doc:
-            doc.close()
+        # Show completion
+        failed = statuses.count('failed')
+        empty = statuses.count('empty')
+        if failed or empty:
+            progress_container.warning(
+                f"⚠️ Σάρωση {page_count} σελίδων: {len(completed_pages)} με κείμενο, "
+                f"{empty} χωρίς κείμενο, {failed} με σφάλμα OCR"
+            )
+        else:
+            progress_container.success(f"✅ Ολοκληρώθηκε η σάρωση {page_count} σελίδων!")
+    
+    return text, needs_ocr, page_count
 
 # ═══════════════════════════════════════════════════════════════
 # 🤖 AGENT 1: DOCUMENT ANALYZER
@@ -653,28 +1320,91 @@ class DocumentAnalyzer:
     "σημαντικα_σημεια": ["...", "...", "..."]
 }"""
 
+    @staticmethod
+    def _compact_for_prompt(text: str, max_chars: int) -> str:
+        """Συμπίεση κειμένου πριν το prompt: κενά, γραμμές συμπλήρωσης (.....) και
+        επαναλαμβανόμενες κεφαλίδες/υποσέλιδα σελίδων - περισσότερο περιεχόμενο ανά token"""
+        lines = []
+        seen_long_lines = set()
+        for raw_line in text.splitlines():
+            line = _RE_INLINE_SPACE.sub(' ', raw_line).strip()
+            if not line:
+                if lines and lines[-1]:
+                    lines.append('')
+                continue
+            line = _RE_LEADER.sub(r'\1\1\1', line)
+            
+            # Ίδια μεγάλη γραμμή σε πολλές σελίδες = κεφαλίδα ή υποσέλιδο
+            if len(line) >= 20 and not _RE_PAGE_MARKER.match(line):
+                if line in seen_long_lines:
+                    continue
+                seen_long_lines.add(line)
+            lines.append(line)
+        return "\n".join(lines)[:max_chars]
+    
+    @staticmethod
+    def _llm_cache_key(text_hash: str, prompt_tag: str) -> str:
+        return f"{text_hash}_{prompt_tag}"
+    
+    @staticmethod
+    def _is_json_object(content: Optional[str]) -> bool:
+        """Αν η απάντηση είναι έγκυρο JSON object (με ή χωρίς markdown fences)"""
+        if not content:
+            return False
+        try:
+            return isinstance(json.loads(_RE_FENCE.sub('', content).strip()), dict)
+        except ValueError:
+            return False
+    
+    @classmethod
+    async def _llm_call_cached(cls, client: AsyncOpenAI, text_hash: str, prompt_tag: str, messages: List[Dict[str, str]], placeholder=None, **kwargs) -> Optional[str]:
+        """Κλήση στο LLM μέσω του LLM_CACHE - ίδιο κείμενο και prompt δεν ξαναπάνε στο δίκτυο.
+        Μόνο απαντήσεις που είναι έγκυρο JSON μπαίνουν στην cache: μια κομμένη απάντηση ξαναζητείται."""
+        cache_key = cls._llm_cache_key(text_hash, prompt_tag)
+        content = LLM_CACHE.get(cache_key)
+        if cls._is_json_object(content):
+            logger.info(f"♻️ LLM cache hit: {cache_key}")
+            return content
+        
+        async with _llm_semaphore():
+            content = await _stream_chat(client, messages, placeholder=placeholder, **kwargs)
+        if cls._is_json_object(content):
+            LLM_CACHE.put(cache_key, content)
+        return content
+    
     @classmethod
     def analyze(cls, text: str) -> Tuple[List[str], Dict[str, str]]:
-        """Αναλύει το κείμενο και επιστρέφει (fields, extracted_data)"""
+        """Sync wrapper του analyze_async"""
+        fields, extracted_data, _ = run_llm(cls.analyze_async(text))
+        return fields, extracted_data
+    
+    @classmethod
+    async def analyze_async(cls, text: str) -> Tuple[List[str], Dict[str, str], bool]:
+        """Αναλύει το κείμενο και επιστρέφει (fields, extracted_data, from_llm) - το from_llm
+        είναι False όταν τα πεδία βγήκαν από το regex fallback"""
         AppState.set_agent_status(1, 'working')
-        client = get_ai_client()
+        client = get_async_ai_client()
         fields = []
         extracted_data = {}
+        from_llm = False
         
         if client:
             try:
                 with st.spinner("🤖 Agent 1 αναλύει το έγγραφο..."):
-                    response = client.chat.completions.create(
-                        model=CONFIG.MODEL_NAME,
+                    content = await cls._llm_call_cached(
+                        client,
+                        compute_file_hash(text.encode('utf-8')),
+                        "fields",
+                        placeholder=st.empty(),
                         messages=[
                             {"role": "system", "content": cls.SYSTEM_PROMPT},
-                            {"role": "user", "content": text[:6000]}
+                            {"role": "user", "content": cls._compact_for_prompt(text, 6000)}
                         ],
                         temperature=0.1,
                         max_tokens=1500
                     )
-                    content = response.choices[0].message.content
                     fields, extracted_data = cls._parse_response(content)
+                    from_llm = bool(fields) and cls._is_json_object(content)
                     logger.info(f"✅ Agent 1: Βρέθηκαν {len(fields)} πεδία, {len(extracted_data)} δεδομένα")
             except Exception as e:
                 logger.warning(f"❌ Agent 1 failed: {e}")
@@ -688,12 +1418,19 @@ class DocumentAnalyzer:
             st.info(f"📋 Regex fallback: Βρέθηκαν {len(fields)} πεδία")
         
         AppState.set_agent_status(1, 'completed')
-        return fields, extracted_data
+        return fields, extracted_data, from_llm
     
     @classmethod
     def generate_summary(cls, text: str) -> Dict[str, Any]:
-        """Generate document summary with critical information"""
-        client = get_ai_client()
+        """Sync wrapper του generate_summary_async"""
+        summary, _ = run_llm(cls.generate_summary_async(text))
+        return summary
+    
+    @classmethod
+    async def generate_summary_async(cls, text: str) -> Tuple[Dict[str, Any], bool]:
+        """Generate document summary with critical information - (summary, from_llm)"""
+        client = get_async_ai_client()
+        from_llm = False
         summary = {
             "περιληψη": "Δεν ήταν δυνατή η ανάλυση του εγγράφου",
             "τυπος": "Άγνωστο",
@@ -706,22 +1443,25 @@ class DocumentAnalyzer:
         if client:
             try:
                 with st.spinner("🤖 Ανάλυση περιεχομένου εγγράφου..."):
-                    response = client.chat.completions.create(
-                        model=CONFIG.MODEL_NAME,
+                    content = await cls._llm_call_cached(
+                        client,
+                        compute_file_hash(text.encode('utf-8')),
+                        "summary",
+                        placeholder=st.empty(),
                         messages=[
                             {"role": "system", "content": cls.SUMMARY_PROMPT},
-                            {"role": "user", "content": text[:4000]}
+                            {"role": "user", "content": cls._compact_for_prompt(text, 4000)}
                         ],
                         temperature=0.2,
                         max_tokens=1000
                     )
-                    content = response.choices[0].message.content
                     summary = cls._parse_summary(content)
+                    from_llm = cls._is_json_object(content)
                     logger.info(f"✅ Document summary generated")
             except Exception as e:
                 logger.warning(f"❌ Summary generation failed: {e}")
         
-        return summary
+        return summary, from_llm
     
     @staticmethod
     def _parse_summary(content: str) -> Dict[str, Any]:
@@ -729,8 +1469,7 @@ class DocumentAnalyzer:
         if not content:
             return {}
         
-        cleaned = re.sub(r'```json\s*', '', content)
-        cleaned = re.sub(r'```\s*', '', cleaned).strip()
+        cleaned = _RE_FENCE.sub('', content).strip()
         
         try:
             return json.loads(cleaned)
@@ -752,8 +1491,7 @@ class DocumentAnalyzer:
             return [], {}
         
         # Καθαρισμός από markdown
-        cleaned = re.sub(r'```json\s*', '', content)
-        cleaned = re.sub(r'```\s*', '', cleaned).strip()
+        cleaned = _RE_FENCE.sub('', content).strip()
         
         try:
             parsed = json.loads(cleaned)
@@ -767,14 +1505,13 @@ class DocumentAnalyzer:
             return fields, extracted_data
         except json.JSONDecodeError:
             # Fallback: ψάξε για λέξεις σε εισαγωγικά
-            matches = re.findall(r'"([^"]+)"', cleaned)
+            matches = _RE_QUOTED.findall(cleaned)
             return [m for m in matches if len(m) > 1], {}
     
     @staticmethod
     def _fallback_field_extraction(text: str) -> List[str]:
         """Fallback με regex αν αποτύχει το AI"""
-        pattern = r'([Α-ΩΆΈΉΊΌΎΏα-ωάέήίόύώ\s\.]+?)(?:[…\.:]+|(?:\s*…………))'
-        matches = re.findall(pattern, text, re.MULTILINE)
+        matches = _RE_GREEK_FIELD.findall(text)
         fields = [m.strip() for m in matches if len(m.strip()) > 2 and len(m.strip()) < 50]
         
         # Deduplication
@@ -819,29 +1556,90 @@ class FormFiller:
     "missing_fields": ["λίστα με κενά πεδία"]
 }"""
 
+    # Structured output: το LM Studio περιορίζει την έξοδο στο schema, οπότε το JSON είναι πάντα έγκυρο
+    RESPONSE_FORMAT = {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "FilledFields",
+            "schema": {
+                "type": "object",
+                "properties": {
+                    "filled_data": {"type": "object", "additionalProperties": {"type": "string"}},
+                    "confidence": {"type": "string", "enum": ["high", "medium", "low"]},
+                    "missing_fields": {"type": "array", "items": {"type": "string"}}
+                },
+                "required": ["filled_data"]
+            }
+        }
+    }
+    MAX_PARSE_RETRIES = 2
+
     @classmethod
     def fill_form(cls, fields: List[str], extracted_data: Dict[str, str], user_profile: Dict[str, str]) -> Dict[str, str]:
+        """Sync wrapper του fill_form_async"""
+        return run_llm(cls.fill_form_async(fields, extracted_data, user_profile))
+    
+    @classmethod
+    async def fill_form_async(cls, fields: List[str], extracted_data: Dict[str, str], user_profile: Dict[str, str]) -> Dict[str, str]:
         """Συμπληρώνει αυτόματα τα πεδία"""
         AppState.set_agent_status(2, 'working')
-        client = get_ai_client()
+        
+        # Ίδια πεδία, δεδομένα και προφίλ δίνουν ίδια απάντηση - χωρίς νέα κλήση στο LLM
+        cache_key = cls._cache_key(fields, extracted_data, user_profile)
+        cached = FORM_CACHE.get(cache_key)
+        if cached is not None:
+            logger.info(f"♻️ Agent 2 cache hit: {cache_key[:16]}")
+            AppState.set_agent_status(2, 'completed')
+            return dict(cached)
+        
+        client = get_async_ai_client()
         filled_data = {}
         
         if client:
             try:
                 with st.spinner("🤖 Agent 2 συμπληρώνει τη φόρμα..."):
                     prompt = cls._build_prompt(fields, extracted_data, user_profile)
-                    response = client.chat.completions.create(
-                        model=CONFIG.MODEL_NAME,
-                        messages=[
-                            {"role": "system", "content": cls.SYSTEM_PROMPT},
-                            {"role": "user", "content": prompt}
-                        ],
-                        temperature=0.1,
-                        max_tokens=1500
-                    )
-                    content = response.choices[0].message.content
-                    filled_data = cls._parse_response(content, fields)
+                    
+                    # Semantic cache: σχεδόν ίδια είσοδος (π.χ. αλλαγή ενός πεδίου του προφίλ)
+                    embedding = await cls._embed(client, prompt)
+                    if embedding is not None:
+                        candidate = SEMANTIC_FORM_CACHE.nearest(embedding)
+                        reused = cls._reuse_semantic(candidate, fields, extracted_data, user_profile) if candidate else None
+                        if reused is not None:
+                            logger.info(f"♻️ Agent 2 semantic cache hit: {len(reused)} πεδία")
+                            FORM_CACHE.put(cache_key, reused)
+                            AppState.set_agent_status(2, 'completed')
+                            return dict(reused)
+                    
+                    messages = [
+                        {"role": "system", "content": cls.SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ]
+                    for attempt in range(cls.MAX_PARSE_RETRIES + 1):
+                        content = await cls._complete(client, messages)
+                        try:
+                            filled_data = cls._parse_response(content, fields)
+                            break
+                        except ValueError as e:
+                            if attempt == cls.MAX_PARSE_RETRIES:
+                                raise
+                            # Retry με feedback: το μοντέλο βλέπει την απάντησή του και το σφάλμα
+                            logger.info(f"Agent 2 invalid JSON (attempt {attempt + 1}): {e}")
+                            messages = messages + [
+                                {"role": "assistant", "content": content or ""},
+                                {"role": "user", "content": f"Your output had error: {e}. Fix and retry."}
+                            ]
+                            await asyncio.sleep(0.5 * 2 ** attempt)
                     logger.info(f"✅ Agent 2: Συμπληρώθηκαν {len(filled_data)} πεδία")
+                    if filled_data:
+                        FORM_CACHE.put(cache_key, filled_data)
+                        if embedding is not None:
+                            SEMANTIC_FORM_CACHE.add(embedding, {
+                                'fields': list(fields),
+                                'extracted_data': extracted_data,
+                                'user_profile': user_profile,
+                                'filled_data': filled_data
+                            })
             except Exception as e:
                 logger.warning(f"❌ Agent 2 failed: {e}")
                 st.warning(f"⚠️ Agent 2 encountered an issue: {e}")
@@ -854,6 +1652,86 @@ class FormFiller:
         AppState.set_agent_status(2, 'completed')
         return filled_data
     
+    @classmethod
+    async def _complete(cls, client: AsyncOpenAI, messages: List[Dict[str, str]]) -> str:
+        """Κλήση στο LLM με JSON schema - αν ο server δεν υποστηρίζει response_format, χωρίς αυτό"""
+        state = _ai_client_store()
+        kwargs = {}
+        if state.get('structured_output', True):
+            kwargs['response_format'] = cls.RESPONSE_FORMAT
+        
+        async with _llm_semaphore():
+            try:
+                response = await client.chat.completions.create(
+                    model=CONFIG.MODEL_NAME, messages=messages, temperature=0.1, max_tokens=1500, **kwargs
+                )
+            except Exception as e:
+                if not kwargs or getattr(e, 'status_code', None) != 400:
+                    raise
+                state['structured_output'] = False
+                logger.info(f"Structured output unsupported, using plain JSON prompts: {e}")
+                response = await client.chat.completions.create(
+                    model=CONFIG.MODEL_NAME, messages=messages, temperature=0.1, max_tokens=1500
+                )
+        return response.choices[0].message.content
+    
+    @staticmethod
+    async def _embed(client: AsyncOpenAI, text: str) -> Optional[List[float]]:
+        """Embedding από το LM Studio - αν δεν υπάρχει embedding model, το semantic cache παρακάμπτεται"""
+        state = _ai_client_store()
+        if time.time() < state.get('embeddings_retry_at', 0.0):
+            return None
+        try:
+            response = await client.embeddings.create(model=CONFIG.EMBEDDING_MODEL, input=text)
+            return response.data[0].embedding
+        except Exception as e:
+            # Νέα προσπάθεια σε 5 λεπτά αντί για ένα αποτυχημένο request ανά συμπλήρωση
+            state['embeddings_retry_at'] = time.time() + 300
+            logger.info(f"Embeddings unavailable, semantic cache disabled for now: {e}")
+            return None
+    
+    @staticmethod
+    def _reuse_semantic(entry: Dict[str, Any], fields: List[str], extracted_data: Dict[str, str],
+                        user_profile: Dict[str, str]) -> Optional[Dict[str, str]]:
+        """Επαλήθευση υποψήφιας εγγραφής: κάθε τιμή πρέπει να προκύπτει από τα τρέχοντα δεδομένα.
+        Η αντιστοίχιση γίνεται ανά κλειδί εισόδου (παλιό κλειδί -> τρέχουσα τιμή του), όχι ανά τιμή."""
+        if not set(fields) <= set(entry.get('fields', [])):
+            return None
+        
+        # Τα extracted_data έχουν προτεραιότητα έναντι του προφίλ, όπως και στο prompt
+        old_inputs = {**entry.get('user_profile', {}), **entry.get('extracted_data', {})}
+        new_inputs = {**user_profile, **extracted_data}
+        # Από ποια κλειδιά εισόδου προήλθε κάθε παλιά τιμή
+        sources: Dict[str, List[str]] = {}
+        for key, old in old_inputs.items():
+            if old:
+                sources.setdefault(old, []).append(key)
+        
+        reused = {}
+        for field_name in fields:
+            value = entry['filled_data'].get(field_name)
+            if not value:
+                continue
+            keys = sources.get(value, [])
+            # Άγνωστη προέλευση, ή ίδια τιμή σε πολλά κλειδιά (π.χ. Όνομα = Όνομα Μητέρας):
+            # δεν ξέρουμε ποιο κλειδί άλλαξε, οπότε καμία επαναχρησιμοποίηση
+            if len(keys) != 1:
+                return None
+            new_value = new_inputs.get(keys[0])
+            if not new_value:
+                return None
+            reused[field_name] = new_value
+        return reused or None
+    
+    @classmethod
+    def _cache_key(cls, fields: List[str], extracted_data: Dict[str, str], user_profile: Dict[str, str]) -> str:
+        """Content-addressable κλειδί από μοντέλο, prompt και όλες τις εισόδους"""
+        canonical = json.dumps(
+            [CONFIG.MODEL_NAME, cls.SYSTEM_PROMPT, sorted(fields), extracted_data, user_profile],
+            sort_keys=True, ensure_ascii=False
+        )
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+    
     @staticmethod
     def _build_prompt(fields: List[str], extracted_data: Dict[str, str], user_profile: Dict[str, str]) -> str:
         """Φτιάχνει το prompt για τον Agent"""
@@ -870,64 +1748,236 @@ USER_PROFILE:
     
     @staticmethod
     def _parse_response(content: str, expected_fields: List[str]) -> Dict[str, str]:
-        """Parse του JSON response"""
+        """Parse του JSON response - ValueError αν δεν ταιριάζει στο schema"""
         if not content:
-            return {}
+            raise ValueError("empty response")
         
-        cleaned = re.sub(r'```json\s*', '', content)
-        cleaned = re.sub(r'```\s*', '', cleaned).strip()
+        # Με structured output δεν υπάρχουν ``` - μένει για servers χωρίς response_format
+        cleaned = _RE_FENCE.sub('', content).strip()
         
-        try:
-            parsed = json.loads(cleaned)
-            filled_data = parsed.get('filled_data', {})
-            return {str(k).strip(): str(v).strip() for k, v in filled_data.items() if v}
-        except json.JSONDecodeError:
-            return {}
+        # Το json.JSONDecodeError είναι υποκλάση του ValueError
+        parsed = json.loads(cleaned)
+        filled_data = parsed.get('filled_data') if isinstance(parsed, dict) else None
+        if not isinstance(filled_data, dict):
+            raise ValueError("'filled_data' must be a JSON object")
+        return {str(k).strip(): str(v).strip() for k, v in filled_data.items() if v}
     
     @staticmethod
     def _fallback_matching(fields: List[str], extracted_data: Dict[str, str], user_profile: Dict[str, str]) -> Dict[str, str]:
-        """Απλό matching αν αποτύχει το AI"""
+        """Matching αν αποτύχει το AI: substring και μετά fuzzy (RapidFuzz) - τα κλειδιά κανονικοποιούνται μία φορά"""
+        from rapidfuzz import fuzz, process
         filled_data = {}
         
+        # Πρώτα το extracted_data, μετά το user_profile - μόνο κλειδιά με τιμή
+        sources = []
+        for data in (extracted_data, user_profile):
+            items = [(key, value) for key, value in data.items() if value]
+            sources.append({
+                'folded': [(_fold_text(key), value) for key, value in items],
+                'choices': [FormFiller._normalize_label(key) for key, _ in items],
+                'values': [value for _, value in items],
+            })
+        
         for field in fields:
-            field_lower = field.lower()
-            
-            # Ψάξε στο extracted_data
-            for key, value in extracted_data.items():
-                if field_lower in key.lower() or key.lower() in field_lower:
-                    if value:
-                        filled_data[field] = value
-                        break
+            field_folded = _fold_text(field)
+            for source in sources:
+                value = next((v for key_folded, v in source['folded'] if field_folded in key_folded or key_folded in field_folded), None)
+                if value:
+                    filled_data[field] = value
+                    break
+            if field in filled_data:
+                continue
             
-            # Αν δεν βρέθηκε, ψάξε στο user_profile
-            if field not in filled_data:
-                for key, value in user_profile.items():
-                    if field_lower in key.lower() or key.lower() in field_lower:
-                        if value:
-                            filled_data[field] = value
-                            break
+            # Fuzzy: τόνοι, κεφαλαία, σημεία στίξης και μικρές ορθογραφικές διαφορές
+            query = FormFiller._normalize_label(field)
+            # Στις συντομογραφίες ένα γράμμα αλλάζει το πεδίο (ΑΜΚΑ ≠ ΑΜΑ) - σχεδόν ακριβές match
+            cutoff = 80 if len(query) > 5 else 95
+            for source in sources:
+                best = process.extractOne(query, source['choices'], scorer=fuzz.token_set_ratio,
+                                          processor=None, score_cutoff=cutoff)
+                if best:
+                    filled_data[field] = source['values'][best[2]]
+                    break
         
         return filled_data
+    
+    @staticmethod
+    def _normalize_label(label: str) -> str:
+        """Πεζά χωρίς τόνους και σημεία στίξης: "ΕΠΩΝΥΜΟ:" και "Επώνυμο", "ΑΦΜ" και "Α.Φ.Μ." γίνονται ίδια"""
+        from rapidfuzz.utils import default_process
+        decomposed = unicodedata.normalize('NFD', label)
+        # Οι τελείες των συντομογραφιών αφαιρούνται (όχι κενό), ώστε "Α.Φ.Μ." -> "αφμ"
+        stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch) and (ch.isalnum() or ch.isspace()))
+        return default_process(stripped)
+
+# ═══════════════════════════════════════════════════════════════
+# 🔀 AGENT ORCHESTRATION
+# ═══════════════════════════════════════════════════════════════
+async def analyze_document(text: str) -> Tuple[List[str], Dict[str, str], Dict[str, Any], bool]:
+    """Τρέχει ταυτόχρονα την ανάλυση του Agent 1 και την περίληψη του εγγράφου.
+    Το τελευταίο στοιχείο είναι True μόνο αν και τα δύο ήρθαν από απάντηση του LLM που έγινε parse."""
+    (fields, extracted_data, fields_from_llm), (summary, summary_from_llm) = await asyncio.gather(
+        DocumentAnalyzer.analyze_async(text),
+        DocumentAnalyzer.generate_summary_async(text)
+    )
+    return fields, extracted_data, summary, fields_from_llm and summary_from_llm
 
 # ═══════════════════════════════════════════════════════════════
 # 📄 PDF FILLING & PREVIEW
 # ═══════════════════════════════════════════════════════════════
+class PageSearch:
+    """Αποτελέσματα αναζήτησης μιας σελίδας - υπολογίζονται μία φορά και μοιράζονται σε όλα τα πεδία"""
+    
+    # Τελείες ΚΑΙ υπογραμμίσεις, με τη σειρά προτίμησης
+    DOT_PATTERNS = ["……", "…", "........", "............", ".....", "_______", "____", "___"]
+    # Κάτω από τόσες λέξεις το κόστος του numpy είναι μεγαλύτερο από το απλό loop
+    VECTOR_MIN_WORDS = 50
+    # Χωρίς TEXT_PRESERVE_IMAGES: αλλιώς το rawdict αποκωδικοποιεί κάθε εικόνα της σελίδας - στα
+    # scanned έντυπα αυτό είναι όλο το κόστος, και εδώ χρειάζονται μόνο τα bbox των χαρακτήρων
+    RAWDICT_FLAGS = fitz.TEXTFLAGS_RAWDICT & ~fitz.TEXT_PRESERVE_IMAGES
+    
+    def __init__(self, page):
+        self.page = page
+        self._search_memo: Dict[str, List[fitz.Rect]] = {}
+        self._word_array: Optional["np.ndarray"] = None
+        
+        # Ένα μόνο parse της σελίδας (rawdict), από το αρχικό περιεχόμενο πριν γραφτεί οποιαδήποτε τιμή:
+        # όλο το κανονικοποιημένο κείμενο σε ένα string (γραμμές χωρισμένες με \n) με το bbox κάθε χαρακτήρα,
+        # ώστε κάθε αναζήτηση να είναι ένα str.find, και οι λέξεις της σελίδας
+        folded: List[str] = []
+        self.boxes: List[Tuple[float, float, float, float]] = []
+        self.words: List[Tuple[float, float, float, float, str]] = []
+        for block in page.get_text("rawdict", flags=self.RAWDICT_FLAGS)["blocks"]:
+            for line in block.get("lines", []):
+                word = []
+                for span in line["spans"]:
+                    for char in span["chars"]:
+                        ch, bbox = char["c"], char["bbox"]
+                        for c in _fold_char(ch):
+                            folded.append(c)
+                            self.boxes.append(bbox)
+                        if ch.isspace():
+                            self._add_word(word)
+                            word = []
+                        else:
+                            word.append((ch, bbox))
+                self._add_word(word)
+                folded.append("\n")
+                self.boxes.append((0.0, 0.0, 0.0, 0.0))
+        self.text = ''.join(folded)
+        
+        self.dot_rects_by_pattern = [(pattern, self.search(pattern)) for pattern in self.DOT_PATTERNS]
+    
+    def _add_word(self, chars: List[Tuple[str, Tuple[float, float, float, float]]]):
+        if chars:
+            boxes = [bbox for _, bbox in chars]
+            self.words.append((
+                min(b[0] for b in boxes), min(b[1] for b in boxes),
+                max(b[2] for b in boxes), max(b[3] for b in boxes),
+                ''.join(ch for ch, _ in chars)
+            ))
+    
+    def search(self, text: str) -> List[fitz.Rect]:
+        """Αναζήτηση χωρίς τόνους/κεφαλαία στο index της σελίδας - το ίδιο label ψάχνεται από πολλά πεδία"""
+        key = _fold_text(text)
+        if key not in self._search_memo:
+            hits = []
+            # Ένα label δεν εκτείνεται σε πολλές γραμμές
+            if key and "\n" not in key:
+                start = self.text.find(key)
+                while start >= 0:
+                    matched = self.boxes[start:start + len(key)]
+                    hits.append(fitz.Rect(
+                        min(b[0] for b in matched), min(b[1] for b in matched),
+                        max(b[2] for b in matched), max(b[3] for b in matched)
+                    ))
+                    start = self.text.find(key, start + len(key))
+            self._search_memo[key] = hits
+        return self._search_memo[key]
+    
+    def insert_x_after(self, rect: fitz.Rect) -> float:
+        """Πρώτος "κενός χώρος" (> 30pt) δεξιά από το rect, στην ίδια γραμμή"""
+        if len(self.words) < self.VECTOR_MIN_WORDS:
+            # Λέξεις στην ίδια γραμμή (περίπου ίδιο y0) δεξιά από το rect.x1, από αριστερά προς τα δεξιά
+            words_on_same_line = sorted(
+                (w for w in self.words if abs(w[1] - rect.y0) < 10 and w[0] > rect.x1),
+                key=lambda w: w[0]
+            )
+            if not words_on_same_line:
+                return rect.x1 + 10
+            
+            current_x = rect.x1
+            for w in words_on_same_line:
+                if w[0] - current_x > 30: # Βρήκαμε αρκετό κενό χώρο!
+                    return current_x + 10
+                current_x = w[2] # Ενημέρωση του current_x στο τέλος της τρέχουσας λέξης
+            # Αν δεν βρέθηκε μεγάλο κενό ανάμεσα στις λέξεις, πάμε στο τέλος της τελευταίας λέξης
+            return words_on_same_line[-1][2] + 10
+        
+        # Ίδιος υπολογισμός διανυσματικά, για σελίδες με πολλές λέξεις. Οι λέξεις ταξινομούνται κατά x0
+        # μία φορά ανά σελίδα - ανά label μένει ένα searchsorted και ένα φίλτρο στο y0 των υπολοίπων
+        import numpy as np
+        if self._word_array is None:
+            words = np.asarray([w[:3] for w in self.words], dtype=np.float64).reshape(-1, 3)
+            self._word_array = words[np.argsort(words[:, 0], kind="stable")]
+        words = self._word_array
+        right = words[np.searchsorted(words[:, 0], rect.x1, side="right"):]
+        line = right[np.abs(right[:, 1] - rect.y0) < 10]
+        if not len(line):
+            return rect.x1 + 10
+        
+        # Το κενό κάθε λέξης μετριέται από το τέλος της προηγούμενης (ή του label για την πρώτη)
+        prev_end = np.concatenate(([rect.x1], line[:-1, 2]))
+        gaps = np.flatnonzero(line[:, 0] - prev_end > 30)
+        if len(gaps):
+            return float(prev_end[gaps[0]]) + 10
+        return float(line[-1, 2]) + 10
+
+# (πεδίο, x, y baseline, partial match)
+FillOp = Tuple[str, float, float, bool]
 
-def fill_pdf_intelligently(input_path: str, field_values: Dict[str, str]) -> Tuple[str, int, List[str], Dict]:
-    """Συμπληρώνει το PDF με τις τιμές, χρήση Ελληνικής Γραμματοσειράς και εφέ 'Τιπ-Εξ'"""
+def plan_page_fills(page, field_names: List[str]) -> List[FillOp]:
+    """Εντοπισμός θέσεων εισαγωγής για όλα τα πεδία μιας σελίδας - δεν αλλάζει τη σελίδα"""
+    search = PageSearch(page)
+    ops = []
+    for field_name in field_names:
+        result = find_field_with_dots(search, field_name)
+        if result:
+            # Το insert_rect.y1 - 2 κάθεται το κείμενο στο baseline
+            _, insert_rect = result
+            ops.append((field_name, insert_rect.x0, insert_rect.y1 - 2, False))
+            continue
+        
+        # Partial matching - μόνο λέξεις > 3 γραμμάτων, οι μεγαλύτερες (πιο συγκεκριμένες) πρώτες
+        candidates = sorted((word for word in field_name.split() if len(word) > 3), key=len, reverse=True)
+        for word in candidates:
+            rects = search.search(word)
+            if rects:
+                ops.append((field_name, rects[0].x1 + 15, rects[0].y1 - 2, True))
+                break
+    return ops
+
+def plan_pdf_fills(doc: fitz.Document, field_names: List[str]) -> List[List[FillOp]]:
+    """Θέσεις εισαγωγής ανά σελίδα - σειριακά: λίγα ms ανά σελίδα, λιγότερα από την εκκίνηση διεργασιών"""
+    return [plan_page_fills(page, field_names) for page in doc]
+
+def fill_pdf_intelligently(input_path: str, field_values: Dict[str, str],
+                           preview_pages: int = 0) -> Tuple[str, int, List[str], Dict, List[bytes]]:
+    """Συμπληρώνει το PDF με τις τιμές, χρήση Ελληνικής Γραμματοσειράς και εφέ 'Τιπ-Εξ'
+    - και φτιάχνει τα previews από το ίδιο ανοιχτό έγγραφο, χωρίς να το ξανανοίξει"""
     doc = None
     filled_count = 0
     errors = []
     filled_details = {}
     
     if not os.path.exists(input_path):
-        return "", 0, ["File not found"], {}
+        return "", 0, ["File not found"], {}, []
     
     output_path = str(CONFIG.TEMP_DIR / f"filled_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
     
     # Αναζήτηση ελληνικής γραμματοσειράς στο σύστημα
-    greek_font_path = get_greek_font_path()
-    if not greek_font_path:
+    greek_font = load_greek_font()
+    if not greek_font:
         logger.warning("Δεν βρέθηκε γραμματοσειρά που να υποστηρίζει Ελληνικά.")
         font_to_use = "helv"  # fallback
     else:
@@ -936,102 +1986,86 @@ def fill_pdf_intelligently(input_path: str, field_values: Dict[str, str]) -> Tup
     try:
         doc = fitz.open(input_path)
         
+        # 1. Καθαρισμός των δεδομένων (Sanitization)
+        values = {}
+        for field_name, raw_value in field_values.items():
+            if not raw_value:
+                continue
+            clean_value = _RE_PLACEHOLDER_ONLY.sub('', raw_value.strip()).translate(_STRIP_BRACKETS)
+            if clean_value.strip():
+                values[field_name] = clean_value
+        
+        # Πλάτος κάθε χαρακτήρα μία φορά ανά έγγραφο - το fitz.get_text_length ξέρει μόνο τις
+        # ενσωματωμένες γραμματοσειρές, οπότε μετράμε με την ίδια τη γραμματοσειρά
+        measure_font = fitz.Font(fontbuffer=greek_font) if greek_font else fitz.Font(font_to_use)
+        chars = ''.join(set(''.join(values.values())))
+        advances = dict(zip(chars, measure_font.char_lengths(chars, fontsize=11)))
+        
+        # Πρώτα εντοπίζονται όλες οι θέσεις, μετά γράφονται σειριακά στο αρχικό έγγραφο
+        plans = plan_pdf_fills(doc, list(values))
+        
         for page_idx, page in enumerate(doc):
+            if not plans[page_idx]:
+                continue
             
-            # Ενσωμάτωση της γραμματοσειράς στη σελίδα (αν βρέθηκε)
-            if font_to_use == "grfont" and greek_font_path:
-                page.insert_font(fontname="grfont", fontfile=greek_font_path)
+            # Ενσωμάτωση της γραμματοσειράς μόνο στις σελίδες που θα γραφτούν (από buffer, χωρίς άνοιγμα αρχείου)
+            if font_to_use == "grfont":
+                page.insert_font(fontname="grfont", fontbuffer=greek_font)
                 
-            for field_name, raw_value in field_values.items():
-                if not raw_value:
-                    continue
-                
-                # 1. Καθαρισμός των δεδομένων (Sanitization)
-                clean_value = re.sub(r'^[\.\[\]\_]+$', '', raw_value.strip())
-                clean_value = clean_value.replace('[', '').replace(']', '')
-                if not clean_value.strip():
-                    continue
-                
-                result = find_field_with_dots(page, field_name)
-                
-                if result:
-                    label_rect, insert_rect = result
-                    try:
+            for field_name, x, y, partial in plans[page_idx]:
+                clean_value = values[field_name]
+                try:
+                    if not partial:
                         # 2. Εφέ Τιπ-Εξ: Ζωγραφίζουμε λευκό φόντο για να σβήσουμε τις τελείες του εγγράφου
-                        text_length = fitz.get_text_length(clean_value, fontname=font_to_use, fontsize=11)
-                        bg_rect = fitz.Rect(
-                            insert_rect.x0 - 2, 
-                            insert_rect.y1 - 12, 
-                            insert_rect.x0 + text_length + 5, 
-                            insert_rect.y1 + 2
-                        )
+                        text_length = sum(advances[c] for c in clean_value)
+                        bg_rect = fitz.Rect(x - 2, y - 10, x + text_length + 5, y + 4)
                         page.draw_rect(bg_rect, color=(1, 1, 1), fill=(1, 1, 1))
-                        
-                        # 3. Εισαγωγή του κειμένου
-                        page.insert_text(
-                            (insert_rect.x0, insert_rect.y1 - 2),
-                            clean_value,
-                            fontsize=11,
-                            color=(0, 0, 0.8), # Σκούρο μπλε
-                            fontname=font_to_use 
-                        )
-                        filled_count += 1
-                        filled_details[field_name] = f"Σελίδα {page_idx + 1}, θέση ({insert_rect.x0:.0f}, {insert_rect.y1 - 2:.0f})"
-                    except Exception as e:
-                        errors.append(f"{field_name}: {e}")
-                else:
-                    # Partial matching
-                    words = field_name.split()
-                    for word in words:
-                        if len(word) > 3:
-                            rects = page.search_for(word)
-                            if rects:
-                                rect = rects[0]
-                                try:
-                                    page.insert_text(
-                                        (rect.x1 + 15, rect.y1 - 2),
-                                        clean_value,
-                                        fontsize=11,
-                                        color=(0, 0, 0.8),
-                                        fontname=font_to_use 
-                                    )
-                                    filled_count += 1
-                                    filled_details[field_name] = f"Σελίδα {page_idx + 1} (partial match)"
-                                    break
-                                except Exception as e:
-                                    errors.append(f"{field_name}: {e}")
-                                break
+                    
+                    # 3. Εισαγωγή του κειμένου
+                    page.insert_text(
+                        (x, y),
+                        clean_value,
+                        fontsize=11,
+                        color=(0, 0, 0.8), # Σκούρο μπλε
+                        fontname=font_to_use 
+                    )
+                    filled_count += 1
+                    if partial:
+                        filled_details[field_name] = f"Σελίδα {page_idx + 1} (partial match)"
+                    else:
+                        filled_details[field_name] = f"Σελίδα {page_idx + 1}, θέση ({x:.0f}, {y:.0f})"
+                except Exception as e:
+                    errors.append(f"{field_name}: {e}")
         
+        # Το ίδιο αρχείο είναι και προεπισκόπηση και τελικό download. Μετρημένο: garbage=4 είναι και ταχύτερο
+        # και μικρότερο από garbage=1/3 (η συγχώνευση διπλότυπων αφήνει λιγότερα streams για deflate)
         doc.save(output_path, deflate=True, garbage=4)
-        return output_path, filled_count, errors, filled_details
+        previews = render_doc_previews(doc, preview_pages) if preview_pages and filled_count else []
+        return output_path, filled_count, errors, filled_details, previews
         
     except Exception as e:
         logger.error(f"PDF filling failed: {e}")
-        return "", 0, [str(e)], {}
+        return "", 0, [str(e)], {}, []
     finally:
         if doc:
             doc.close()
 
-def find_field_with_dots(page, field_name: str) -> Optional[Tuple[fitz.Rect, fitz.Rect]]:
+def find_field_with_dots(search: PageSearch, field_name: str) -> Optional[Tuple[fitz.Rect, fitz.Rect]]:
     """Βρίσκει το πεδίο και την κατάλληλη θέση εισαγωγής, αποφεύγοντας το γράψιμο πάνω σε άλλο κείμενο."""
+    # Η αναζήτηση αγνοεί τόνους και κεφαλαία, οπότε upper()/title() παραλλαγές δεν χρειάζονται
     search_patterns = [
         field_name + ":",
         field_name,
-        field_name.upper(),
-        field_name.title(),
         field_name.replace("Όνομα ", ""),
     ]
     
     for pattern in search_patterns:
-        rects = page.search_for(pattern)
+        rects = search.search(pattern)
         if rects:
             rect = rects[0]
             
             # Ψάχνουμε για τελείες ΚΑΙ υπογραμμίσεις στο ύψος της λέξης
-            dot_patterns = ["……", "…", "........", "............", ".....", "_______", "____", "___"]
-            
-            for dot_pattern in dot_patterns:
-                dot_rects = page.search_for(dot_pattern)
+            for _, dot_rects in search.dot_rects_by_pattern:
                 for dot_rect in dot_rects:
                     # ΔΙΟΡΘΩΜΕΝΟ: Αυστηρότερος έλεγχος θέσης - οι τελείες πρέπει να είναι ΔΕΞΙΑ από το label
                     if abs(dot_rect.y0 - rect.y0) < 15 and dot_rect.x0 > rect.x1:
@@ -1044,34 +2078,8 @@ def find_field_with_dots(page, field_name: str) -> Optional[Tuple[fitz.Rect, fit
                         return rect, insert_rect
             
             # Έξυπνο Fallback: Αν δεν βρει γραμμή, ψάχνει για τον πρώτο "κενό χώρο" δεξιά
-            # Παίρνουμε όλες τις λέξεις στη σελίδα
-            words = page.get_text("words")
-            
-            # Βρίσκουμε τις λέξεις που είναι στην ίδια γραμμή (περίπου ίδιο y0)
-            # και βρίσκονται δεξιά από το rect.x1
-            words_on_same_line = [
-                w for w in words 
-                if abs(w[1] - rect.y0) < 10 and w[0] > rect.x1
-            ]
+            insert_x = search.insert_x_after(rect)
             
-            # Ταξινομούμε τις λέξεις με βάση τη συντεταγμένη x (από αριστερά προς τα δεξιά)
-            words_on_same_line.sort(key=lambda w: w[0])
-            
-            insert_x = rect.x1 + 10 # Αρχικό σημείο εκκίνησης
-            
-            # Αν υπάρχουν άλλες λέξεις στη γραμμή, βρες το πρώτο "μεγάλο" κενό (π.χ. > 20 pixels)
-            if words_on_same_line:
-                current_x = rect.x1
-                for w in words_on_same_line:
-                    gap = w[0] - current_x
-                    if gap > 30: # Βρήκαμε αρκετό κενό χώρο!
-                        insert_x = current_x + 10
-                        break
-                    current_x = w[2] # Ενημέρωση του current_x στο τέλος της τρέχουσας λέξης
-                else:
-                    # Αν δεν βρέθηκε μεγάλο κενό ανάμεσα στις λέξεις, πάμε στο τέλος της τελευταίας λέξης
-                    insert_x = words_on_same_line[-1][2] + 10
-                    
             insert_rect = fitz.Rect(
                 insert_x, 
                 rect.y0,
@@ -1082,112 +2090,42 @@ def find_field_with_dots(page, field_name: str) -> Optional[Tuple[fitz.Rect, fit
     
     return None
 
-def fill_pdf_intelligently(input_path: str, field_values: Dict[str, str]) -> Tuple[str, int, List[str], Dict]:
-    """Συμπληρώνει το PDF με τις τιμές και χρήση Ελληνικής Γραμματοσειράς"""
+@st.cache_data(show_spinner=False, max_entries=16)
+def _render_pdf_previews(file_hash: str, _pdf_path: str, max_pages: int) -> List[bytes]:
+    """PNG previews στη μνήμη ανά hash περιεχομένου - το _pdf_path δεν μπαίνει στο κλειδί της cache"""
     doc = None
-    filled_count = 0
-    errors = []
-    filled_details = {}
-    
-    if not os.path.exists(input_path):
-        return "", 0, ["File not found"], {}
-    
-    output_path = str(CONFIG.TEMP_DIR / f"filled_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
-    
-    # Αναζήτηση ελληνικής γραμματοσειράς στο σύστημα
-    greek_font_path = get_greek_font_path()
-    if not greek_font_path:
-        logger.warning("Δεν βρέθηκε γραμματοσειρά που να υποστηρίζει Ελληνικά. Ενδέχεται να υπάρξει πρόβλημα κωδικοποίησης.")
-        font_to_use = "helv"  # fallback
-    else:
-        font_to_use = "grfont"
-    
     try:
-        doc = fitz.open(input_path)
-        
-        for page_idx, page in enumerate(doc):
-            
-            # Ενσωμάτωση της γραμματοσειράς στη σελίδα (αν βρέθηκε)
-            if font_to_use == "grfont" and greek_font_path:
-                page.insert_font(fontname="grfont", fontfile=greek_font_path)
-                
-            for field_name, value in field_values.items():
-                if not value or not value.strip():
-                    continue
-                
-                result = find_field_with_dots(page, field_name)
-                
-                if result:
-                    label_rect, insert_rect = result
-                    try:
-                        # Χρησιμοποιούμε το insert_rect.y1 - 2 για να κάτσει το κείμενο στο baseline
-                        page.insert_text(
-                            (insert_rect.x0, insert_rect.y1 - 2),
-                            value,
-                            fontsize=11,
-                            color=(0, 0, 0.8),
-                            fontname=font_to_use  # <--- Χρήση της νέας γραμματοσειράς!
-                        )
-                        filled_count += 1
-                        filled_details[field_name] = f"Σελίδα {page_idx + 1}, θέση ({insert_rect.x0:.0f}, {insert_rect.y1 - 2:.0f})"
-                    except Exception as e:
-                        errors.append(f"{field_name}: {e}")
-                else:
-                    # Partial matching
-                    words = field_name.split()
-                    for word in words:
-                        if len(word) > 3:
-                            rects = page.search_for(word)
-                            if rects:
-                                rect = rects[0]
-                                try:
-                                    page.insert_text(
-                                        (rect.x1 + 15, rect.y1 - 2),
-                                        value,
-                                        fontsize=11,
-                                        color=(0, 0, 0.8),
-                                        fontname=font_to_use  # <--- Χρήση της νέας γραμματοσειράς!
-                                    )
-                                    filled_count += 1
-                                    filled_details[field_name] = f"Σελίδα {page_idx + 1} (partial match)"
-                                    break
-                                except Exception as e:
-                                    errors.append(f"{field_name}: {e}")
-                                break
-        
-        doc.save(output_path, deflate=True, garbage=4)
-        return output_path, filled_count, errors, filled_details
-        
+        doc = fitz.open(_pdf_path)
+        return render_doc_previews(doc, max_pages)
     except Exception as e:
-        logger.error(f"PDF filling failed: {e}")
-        return "", 0, [str(e)], {}
+        logger.error(f"Preview generation failed: {e}")
+        return []
     finally:
         if doc:
             doc.close()
 
-def generate_pdf_preview(pdf_path: str, max_pages: int = 3) -> List[str]:
-    """Generate PNG previews of PDF pages"""
+def render_doc_previews(doc: fitz.Document, max_pages: int) -> List[bytes]:
+    """PNG previews των πρώτων σελίδων ενός ήδη ανοιχτού εγγράφου"""
     previews = []
-    doc = None
-    
     try:
-        doc = fitz.open(pdf_path)
         for page_num in range(min(len(doc), max_pages)):
-            page = doc[page_num]
-            # Higher resolution for better preview
-            mat = fitz.Matrix(2, 2)
-            pix = page.get_pixmap(matrix=mat)
-            img_path = str(CONFIG.TEMP_DIR / f"preview_page_{page_num}.png")
-            pix.save(img_path)
-            previews.append(img_path)
+            # 1.5x αρκεί - ο browser κλιμακώνει την εικόνα στο πλάτος της στήλης
+            pix = doc[page_num].get_pixmap(matrix=fitz.Matrix(1.5, 1.5))
+            # Κατευθείαν σε bytes, χωρίς γράψιμο και ξαναδιάβασμα από τον δίσκο
+            previews.append(pix.tobytes("png"))
     except Exception as e:
         logger.error(f"Preview generation failed: {e}")
-    finally:
-        if doc:
-            doc.close()
-    
     return previews
 
+def generate_pdf_preview(pdf_path: str, max_pages: int = 3) -> List[bytes]:
+    """Generate PNG previews of PDF pages"""
+    try:
+        file_hash = compute_file_hash_path(pdf_path)
+    except OSError as e:
+        logger.error(f"Preview generation failed: {e}")
+        return []
+    return _render_pdf_previews(file_hash, pdf_path, max_pages)
+
 # ═══════════════════════════════════════════════════════════════
 # 🎨 UI COMPONENTS
 # ═══════════════════════════════════════════════════════════════
@@ -1327,6 +2265,10 @@ def render_document_summary(summary: Dict[str, Any]):
             </div>
             """, unsafe_allow_html=True)
 
+def _update_profile_field(field: str, key: str):
+    """on_change του text_input: γράφει στο προφίλ μόνο το πεδίο που άλλαξε"""
+    st.session_state.user_profile[field] = st.session_state[key]
+
 def render_user_profile_tab():
     """Tab για ρύθμιση προφίλ χρήστη με persistent storage"""
     st.subheader("👤 Προφίλ Χρήστη για Αυτόματη Συμπλήρωση")
@@ -1352,10 +2294,12 @@ def render_user_profile_tab():
                 with cols[i % 2]:
                     key = f"profile_{field.replace(' ', '_')}"
                     current_value = st.session_state.user_profile.get(field, "")
-                    st.session_state.user_profile[field] = st.text_input(
+                    st.text_input(
                         field,
                         value=current_value,
-                        key=key
+                        key=key,
+                        on_change=_update_profile_field,
+                        args=(field, key)
                     )
     
     col1, col2 = st.columns(2)
@@ -1371,6 +2315,9 @@ def render_user_profile_tab():
     with col2:
         if st.button("🗑️ Καθαρισμός Προφίλ", use_container_width=True):
             st.session_state.user_profile = {}
+            # Και οι τιμές των widgets, αλλιώς θα εμφανίζονταν ξανά μετά το rerun
+            for key in [k for k in st.session_state if str(k).startswith("profile_")]:
+                del st.session_state[key]
             UserProfileManager.save({})
             st.warning("🗑️ Το προφίλ διαγράφηκε")
             st.rerun()
@@ -1395,7 +2342,7 @@ def render_auto_fill_results():
     with col2:
         st.markdown("**✅ Συμπληρωμένα πεδία (Agent 2):**")
         if agent2_data:
-            filled_count = len([v for v in agent2_data.values() if v])
+            filled_count = sum(map(bool, agent2_data.values()))
             total_count = len(agent2_data)
             # ΔΙΟΡΘΩΜΕΝΟ: Σωστός τύπος δεδομένων για το progress
             progress_value = float(filled_count) / float(total_count) if total_count > 0 else 0.0
@@ -1449,33 +2396,70 @@ def render_pdf_preview(key_suffix: str = "default"):
             st.markdown("<div class='pdf-preview-container'>", unsafe_allow_html=True)
             
             preview_cols = st.columns(min(len(previews), 3))
-            for i, (col, preview_path) in enumerate(zip(preview_cols, previews)):
+            for i, (col, preview_png) in enumerate(zip(preview_cols, previews)):
                 with col:
-                    st.image(preview_path, caption=f"Σελίδα {i+1}", use_container_width=True)
+                    st.image(preview_png, caption=f"Σελίδα {i+1}", use_container_width=True)
             
             st.markdown("</div>", unsafe_allow_html=True)
         
-        # Download button
-        with open(filled_pdf, "rb") as f:
-            st.download_button(
-                "💾 Κατέβασμα Συμπληρωμένου PDF",
-                f.read(),
-                file_name=f"completed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
-                mime="application/pdf",
-                use_container_width=True,
-                type="primary",
-                key=f"download_btn_{key_suffix}"
-            )
+        # Download button - τα bytes διαβάζονται μία φορά ανά συμπληρωμένο PDF, όχι σε κάθε tab και rerun
+        cached = st.session_state.get('filled_pdf_bytes')
+        if not cached or cached[0] != filled_pdf:
+            with open(filled_pdf, "rb") as f:
+                cached = (filled_pdf, f.read())
+            st.session_state.filled_pdf_bytes = cached
+        st.download_button(
+            "💾 Κατέβασμα Συμπληρωμένου PDF",
+            cached[1],
+            file_name=f"completed_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf",
+            mime="application/pdf",
+            use_container_width=True,
+            type="primary",
+            key=f"download_btn_{key_suffix}"
+        )
     else:
         st.info("📄 Η προεπισκόπηση θα εμφανιστεί μετά τη συμπλήρωση του PDF")
 
+# Λέξεις-κλειδιά ανά κατηγορία (προσωπικά, τοποθεσία, ταυτότητα, ημερομηνίες), κανονικοποιημένες με το
+# ίδιο _fold_text με τα πεδία - αλλιώς π.χ. το τελικό 'ς' (που γίνεται 'σ') δεν ταιριάζει ποτέ
+_FIELD_CATEGORY_KEYWORDS = tuple(
+    tuple(_fold_text(word) for word in words)
+    for words in (
+        ['ονομα', 'επωνυμο', 'πατερα', 'μητερα', 'επαγγελμα'],
+        ['τοπος', 'διευθυνση', 'τκ', 'ταχυδρομικος', 'οδος', 'περιοχη'],
+        ['ταυτοτητα', 'αστ', 'αφμ', 'εκδ', 'αρχη', 'μητρωου'],
+        ['ημερομηνια', 'ημερ', 'ετος', 'εξαμηνο'],
+    )
+)
+
+def _manual_fill_layout(fields: List[str]) -> List[List[Tuple[str, str]]]:
+    """(πεδίο, widget key) ανά κατηγορία για τη χειροκίνητη συμπλήρωση"""
+    # Κατηγοριοποίηση πεδίων - η τελευταία κατηγορία ("Άλλα") για όσα δεν ταιριάζουν πουθενά
+    categories: List[List[str]] = [[] for _ in range(len(_FIELD_CATEGORY_KEYWORDS) + 1)]
+    for f in fields:
+        # Χωρίς τόνους/κεφαλαία, ώστε "Όνομα" και "ΟΝΟΜΑ" να πέφτουν στην ίδια κατηγορία
+        f_folded = _fold_text(f)
+        cat_idx = next(
+            (i for i, keywords in enumerate(_FIELD_CATEGORY_KEYWORDS) if any(x in f_folded for x in keywords)),
+            len(_FIELD_CATEGORY_KEYWORDS)
+        )
+        categories[cat_idx].append(f)
+    
+    # Κατηγορία και θέση ορίζουν μοναδικά το πεδίο - σταθερά keys και μετά από restart, χωρίς συγκρούσεις
+    # του hash(). Μία φορά ανά πεδίο, κοινά για τα widgets και για το μάζεμα τιμών
+    return [
+        [(field, f"input_{cat_idx}_{i}_{field.translate(_SAFE_KEY_TABLE)}") for i, field in enumerate(cat_fields)]
+        for cat_idx, cat_fields in enumerate(categories)
+    ]
+
 def render_form_filler_tab():
     """Το κύριο tab για συμπλήρωση φόρμας"""
-    if not st.session_state.get('is_pdf'):
+    ss = st.session_state
+    if not ss.get('is_pdf'):
         st.info("📄 Μόνο για PDF αρχεία. Ανέβασε ένα PDF για να συμπληρώσεις τη φόρμα.")
         return
     
-    fields = list(dict.fromkeys(st.session_state.get('dynamic_fields', [])))
+    fields = list(dict.fromkeys(ss.get('dynamic_fields', [])))
     
     if not fields:
         st.warning("Δεν βρέθηκαν πεδία. Κάνε πρώτα ανάλυση του εγγράφου στην καρτέλα 'Ανάλυση Εγγράφου'.")
@@ -1502,102 +2486,88 @@ def render_form_filler_tab():
                 AppState.set_agent_status(2, 'waiting')
                 
                 # Agent 1: Ανάλυση εγγράφου
-                text = st.session_state.get('extracted_text', '')
+                text = ss.get('extracted_text', '')
                 agent1_fields, agent1_data = DocumentAnalyzer.analyze(text)
-                st.session_state.agent1_extracted_data = agent1_data
+                ss.agent1_extracted_data = agent1_data
                 
                 # Agent 2: Συμπλήρωση φόρμας
-                user_profile = st.session_state.get('user_profile', {})
+                user_profile = ss.get('user_profile', {})
                 agent2_data = FormFiller.fill_form(fields, agent1_data, user_profile)
-                st.session_state.agent2_filled_data = agent2_data
-                st.session_state.auto_filled = True
+                ss.agent2_filled_data = agent2_data
+                ss.auto_filled = True
                 st.rerun()
     
     with col2:
         if st.button("✏️ Χειροκίνητη Συμπλήρωση", use_container_width=True):
-            st.session_state.auto_filled = False
+            ss.auto_filled = False
             # ΔΙΟΡΘΩΜΕΝΟ: Καθαρισμός των filled_data όταν πάμε σε χειροκίνητη λειτουργία
-            st.session_state.agent2_filled_data = {}
+            ss.agent2_filled_data = {}
             st.rerun()
     
     # Εμφάνιση αποτελεσμάτων
-    if st.session_state.get('auto_filled'):
+    if ss.get('auto_filled'):
         render_auto_fill_results()
     else:
         # Χειροκίνητη συμπλήρωση
         st.subheader("✏️ Χειροκίνητη Συμπλήρωση Πεδίων")
         
-        # Κατηγοριοποίηση πεδίων
-        personal, location, id_cards, dates, other = [], [], [], [], []
-        for f in fields:
-            f_lower = f.lower()
-            if any(x in f_lower for x in ['ονομα', 'επωνυμο', 'πατερα', 'μητερα', 'επαγγελμα']):
-                personal.append(f)
-            elif any(x in f_lower for x in ['τοπος', 'διευθυνση', 'τκ', 'ταχυδρομικός', 'οδος', 'περιοχη']):
-                location.append(f)
-            elif any(x in f_lower for x in ['ταυτότητα', 'αστ', 'αφμ', 'εκδ', 'αρχή', 'μητρωου']):
-                id_cards.append(f)
-            elif any(x in f_lower for x in ['ημερομηνία', 'έτος', 'ημερ', 'ετος', 'εξαμηνο']):
-                dates.append(f)
-            else:
-                other.append(f)
-        
-        tabs = st.tabs(["👤 Προσωπικά", "📍 Τοποθεσία", "🆔 Ταυτότητα/ΑΦΜ", "📅 Ημερομηνίες", "📝 Άλλα"])
-        all_categories = [personal, location, id_cards, dates, other]
-        
-        if 'form_data' not in st.session_state:
-            st.session_state.form_data = {}
+        # Κατηγορίες και keys αλλάζουν μόνο όταν αλλάξουν τα πεδία - όχι σε κάθε rerun
+        signature = tuple(fields)
+        layout = ss.get('form_layout')
+        if not layout or layout[0] != signature:
+            layout = (signature, _manual_fill_layout(fields))
+            ss.form_layout = layout
+        cat_keys = layout[1]
         
-        for tab, cat_fields in zip(tabs, all_categories):
-            with tab:
-                if not cat_fields:
-                    st.caption("Δεν υπάρχουν πεδία σε αυτή την κατηγορία")
-                    continue
-                
-                cols = st.columns(2)
-                for i, field in enumerate(cat_fields):
-                    with cols[i % 2]:
-                        # ΔΙΟΡΘΩΜΕΝΟ: Πιο ασφαλής δημιουργία key
-                        safe_key = re.sub(r'[^\w]', '_', field)
-                        key = f"input_{safe_key}_{i}_{hash(field) % 10000}"  # Προσθήκη hash για μοναδικότητα
-                        
-                        if key not in st.session_state.form_data:
-                            st.session_state.form_data[key] = ""
-                        
-                        st.session_state.form_data[key] = st.text_input(
-                            f"**{field}**",
-                            value=st.session_state.form_data[key],
-                            key=key
-                        )
-        
-        # Μάζεμα τιμών - ΔΙΟΡΘΩΜΕΝΟ: Χρήση .get() για ασφάλεια
+        form_data = ss.setdefault('form_data', {})
+        # Οι τιμές μαζεύονται στο ίδιο πέρασμα που φτιάχνει τα widgets
         all_values = {}
-        for cat_fields in all_categories:
-            for i, field in enumerate(cat_fields):
-                safe_key = re.sub(r'[^\w]', '_', field)
-                key = f"input_{safe_key}_{i}_{hash(field) % 10000}"
-                val = st.session_state.form_data.get(key, "")
-                if val and val.strip():
-                    all_values[field] = val
         
-        st.session_state.agent2_filled_data = all_values
+        # Μέσα σε form: η πληκτρολόγηση δεν προκαλεί rerun ανά πεδίο, μόνο η αποθήκευση
+        with st.form("manual_fill_form", clear_on_submit=False):
+            tabs = st.tabs(["👤 Προσωπικά", "📍 Τοποθεσία", "🆔 Ταυτότητα/ΑΦΜ", "📅 Ημερομηνίες", "📝 Άλλα"])
+            
+            for tab, cat_fields in zip(tabs, cat_keys):
+                with tab:
+                    if not cat_fields:
+                        st.caption("Δεν υπάρχουν πεδία σε αυτή την κατηγορία")
+                        continue
+                    
+                    # Ζυγά πεδία αριστερά, μονά δεξιά - δύο ευθείς βρόχοι αντί για cols[i % 2] ανά πεδίο
+                    for col, col_fields in zip(st.columns(2), (cat_fields[0::2], cat_fields[1::2])):
+                        with col:
+                            for field, key in col_fields:
+                                val = st.text_input(
+                                    f"**{field}**",
+                                    value=form_data.setdefault(key, ""),
+                                    key=key
+                                )
+                                form_data[key] = val
+                                if val and val.strip():
+                                    all_values[field] = val
+            
+            st.form_submit_button("💾 Αποθήκευση τιμών", use_container_width=True)
+        
+        ss.agent2_filled_data = all_values
     
     st.divider()
     
     # Κουμπί για τελική συμπλήρωση PDF
-    filled_data = st.session_state.get('agent2_filled_data', {})
+    filled_data = ss.get('agent2_filled_data', {})
     
     if filled_data:
         col1, col2 = st.columns([1, 2])
         with col1:
             if st.button("📄 Συμπλήρωση PDF", type="primary", use_container_width=True):
                 with st.spinner("Συμπλήρωση PDF σε εξέλιξη..."):
-                    tmp_path = st.session_state.get('tmp_pdf_path')
-                    output_path, count, errors, details = fill_pdf_intelligently(tmp_path, filled_data)
+                    tmp_path = ss.get('tmp_pdf_path')
+                    output_path, count, errors, details, previews = fill_pdf_intelligently(tmp_path, filled_data, preview_pages=3)
                 
                     if count > 0:
-                        st.session_state.filled_pdf_path = output_path
-                        st.session_state.pdf_preview_pages = []  # Reset previews
+                        ss.filled_pdf_path = output_path
+                        ss.filled_pdf_bytes = None
+                        # Previews από το ίδιο πέρασμα - αν λείπουν, τα φτιάχνει το render_pdf_preview
+                        ss.pdf_preview_pages = previews
                         st.success(f"✅ Συμπληρώθηκαν {count} πεδία!")
                         
                         with st.expander("🔍 Λεπτομέρειες συμπλήρωσης"):
@@ -1613,7 +2583,7 @@ def render_form_filler_tab():
                                     st.text(e)
         
         with col2:
-            filled_count = len([v for v in filled_data.values() if v])
+            filled_count = sum(map(bool, filled_data.values()))
             st.info(f"💡 Έτοιμα για συμπλήρωση: {filled_count}/{len(fields)} πεδία")
     
     # PDF Preview Section
@@ -1623,7 +2593,57 @@ def render_form_filler_tab():
 # ═══════════════════════════════════════════════════════════════
 # 🚀 MAIN APPLICATION
 # ═══════════════════════════════════════════════════════════════
+# Αναλύσεις ανά file hash που κρατά κάθε session
+ANALYSIS_CACHE_MAX_ENTRIES = 8
+
+def run_document_analysis(uploaded) -> Optional[Tuple[str, List[str], Dict[str, str], Dict, bool]]:
+    """Εξαγωγή κειμένου και Agent 1 για το ανεβασμένο αρχείο - None αν δεν βρέθηκε κείμενο.
+    Το τελευταίο στοιχείο λέει αν το αποτέλεσμα ήρθε από το LLM ή από τα fallbacks."""
+    # Create a container for scanning progress
+    scan_container = st.container()
+    
+    progress_text = st.empty()
+    progress_bar = st.progress(0)
+    
+    progress_text.text("📖 Εξαγωγή κειμένου από το έγγραφο...")
+    progress_bar.progress(25)
+    
+    text = ""
+    try:
+        if uploaded.type == "application/pdf":
+            text, _, _ = extract_text_from_pdf_with_progress(st.session_state.tmp_pdf_path, scan_container)
+        elif uploaded.type.startswith("image/"):
+            warn_if_tesseract_missing()
+            text = extract_text_from_image(st.session_state.file_hash, st.session_state.tmp_pdf_path)
+        else:
+            import docx
+            doc = docx.Document(st.session_state.tmp_pdf_path)
+            text = "\n".join(p.text for p in doc.paragraphs)
+    except Exception as e:
+        st.error(f"❌ Σφάλμα κατά την εξαγωγή κειμένου: {e}")
+        logger.error(f"Text extraction failed: {e}")
+        return None
+    
+    # ΔΙΟΡΘΩΜΕΝΟ: Έλεγχος αν βρέθηκε κείμενο
+    if not text or not text.strip():
+        st.error("❌ Δεν βρέθηκε κείμενο στο έγγραφο. Προσπάθησε με καλύτερη ποιότητα σάρωσης.")
+        return None
+    
+    progress_bar.progress(50)
+    
+    progress_text.text("🤖 Agent 1 αναλύει το έγγραφο και δημιουργεί την περιγραφή...")
+    progress_bar.progress(75)
+    
+    # Agent 1: Ανάλυση εγγράφου και περίληψη ταυτόχρονα
+    fields, extracted_data, summary, from_llm = run_llm(analyze_document(text))
+    
+    progress_bar.progress(100)
+    progress_text.empty()
+    progress_bar.empty()
+    return text, fields, extracted_data, summary, from_llm
+
 def main():
+    ss = st.session_state
     # Header
     st.title("🤖 Bureaucracy Slayer Pro")
     st.markdown("<p style='color: #666; font-size: 1.1em;'>Αυτόματη ανάλυση και συμπλήρωση γραφειοκρατικών εγγράφων με 2 AI Agents</p>", unsafe_allow_html=True)
@@ -1660,8 +2680,8 @@ def main():
         st.divider()
         
         # Profile Summary
-        profile = st.session_state.get('user_profile', {})
-        filled_fields = len([v for v in profile.values() if v])
+        profile = ss.get('user_profile', {})
+        filled_fields = sum(map(bool, profile.values()))
         if filled_fields > 0:
             st.success(f"👤 Προφίλ: {filled_fields} πεδία συμπληρωμένα")
         else:
@@ -1704,97 +2724,93 @@ def main():
             return
         
         # ΔΙΟΡΘΩΜΕΝΟ: Έλεγχος μεγέθους αρχείου
-        file_content = uploaded.getvalue()
-        file_size_mb = len(file_content) / (1024 * 1024)
+        file_size_mb = uploaded.size / (1024 * 1024)
         
         if file_size_mb > CONFIG.MAX_FILE_SIZE_MB:
             st.error(f"❌ Το αρχείο είναι πολύ μεγάλο ({file_size_mb:.1f} MB). Μέγιστο επιτρεπτό: {CONFIG.MAX_FILE_SIZE_MB} MB")
             return
         
-        file_hash = compute_file_hash(file_content)
-        
-        if file_hash != st.session_state.get('file_hash'):
-            AppState.reset()
-            st.session_state.file_hash = file_hash
-            st.session_state.is_pdf = uploaded.type == "application/pdf"
+        # Κάθε νέο upload γράφεται στον δίσκο μία φορά και σε κομμάτια - όχι αντίγραφο στη μνήμη σε κάθε rerun.
+        # Το hash υπολογίζεται στο ίδιο πέρασμα με το γράψιμο
+        if uploaded.file_id != ss.get('upload_id'):
+            ext = os.path.splitext(uploaded.name)[1].lower() or '.pdf'
+            incoming_path = CONFIG.TEMP_DIR / f"bs_incoming_{uploaded.file_id}{ext}"
+            digest = hashlib.sha256()
+            uploaded.seek(0)
+            with open(incoming_path, "wb") as f:
+                for chunk in iter(lambda: uploaded.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    f.write(chunk)
+            file_hash = digest.hexdigest()[:16]
             
-            ext = Path(uploaded.name).suffix.lower() or '.pdf'
-            tmp_path = CONFIG.TEMP_DIR / f"bs_{file_hash}{ext}"
-            with open(tmp_path, "wb") as f:
-                f.write(file_content)
-            st.session_state.tmp_pdf_path = str(tmp_path)
-            st.success(f"✅ Αρχείο αποθηκεύτηκε: {uploaded.name} ({file_size_mb:.1f} MB)")
+            if file_hash != ss.get('file_hash'):
+                AppState.reset()
+                ss.file_hash = file_hash
+                ss.is_pdf = uploaded.type == "application/pdf"
+                
+                tmp_path = CONFIG.TEMP_DIR / f"bs_{file_hash}{ext}"
+                os.replace(incoming_path, tmp_path)
+                # Η εξαγωγή κειμένου ζητά το hash ανά path - είναι ήδη γνωστό
+                remember_file_hash(str(tmp_path), file_hash)
+                ss.tmp_pdf_path = str(tmp_path)
+                st.success(f"✅ Αρχείο αποθηκεύτηκε: {uploaded.name} ({file_size_mb:.1f} MB)")
+            else:
+                # Το ίδιο αρχείο ξανά - υπάρχει ήδη στον δίσκο
+                os.unlink(incoming_path)
+            ss.upload_id = uploaded.file_id
         
         # Analysis Button
         if st.button("🔍 Εκκίνηση AI Agents - Ανάλυση", type="primary", use_container_width=True):
-            # Create a container for scanning progress
-            scan_container = st.container()
-            
-            progress_text = st.empty()
-            progress_bar = st.progress(0)
-            
-            progress_text.text("📖 Εξαγωγή κειμένου από το έγγραφο...")
-            progress_bar.progress(25)
-            
-            text = ""
-            try:
-                if uploaded.type == "application/pdf":
-                    text, _, _ = extract_text_from_pdf_with_progress(st.session_state.tmp_pdf_path, scan_container)
-                elif uploaded.type.startswith("image/"):
-                    img = Image.open(st.session_state.tmp_pdf_path)
-                    text = pytesseract.image_to_string(img, lang='ell+eng')
-                else:
-                    doc = docx.Document(st.session_state.tmp_pdf_path)
-                    text = "\n".join([p.text for p in doc.paragraphs])
-            except Exception as e:
-                st.error(f"❌ Σφάλμα κατά την εξαγωγή κειμένου: {e}")
-                logger.error(f"Text extraction failed: {e}")
-                return
-            
-            # ΔΙΟΡΘΩΜΕΝΟ: Έλεγχος αν βρέθηκε κείμενο
-            if not text or not text.strip():
-                st.error("❌ Δεν βρέθηκε κείμενο στο έγγραφο. Προσπάθησε με καλύτερη ποιότητα σάρωσης.")
-                return
-            
-            st.session_state.extracted_text = text
-            progress_bar.progress(50)
-            
-            progress_text.text("🤖 Agent 1 αναλύει το έγγραφο...")
-            progress_bar.progress(75)
-            
-            # Agent 1: Ανάλυση εγγράφου
-            fields, extracted_data = DocumentAnalyzer.analyze(text)
-            st.session_state.dynamic_fields = fields
-            st.session_state.agent1_extracted_data = extracted_data
-            
-            progress_bar.progress(85)
-            
-            # Generate document summary
-            progress_text.text("📋 Δημιουργία περιγραφής εγγράφου...")
-            summary = DocumentAnalyzer.generate_summary(text)
-            st.session_state.document_summary = summary
+            # Ίδιο αρχείο που έχει ήδη αναλυθεί σε αυτό το session - χωρίς νέα εξαγωγή και κλήσεις στο LLM
+            analysis_cache = ss.setdefault('analysis_cache', OrderedDict())
+            result = analysis_cache.get(ss.file_hash)
+            if result is not None:
+                analysis_cache.move_to_end(ss.file_hash)
+                AppState.set_agent_status(1, 'completed')
+            else:
+                result = run_document_analysis(uploaded)
+                if result is None:
+                    return
+                # Μόνο απαντήσεις του LLM: ένα regex/offline fallback (π.χ. με κλειστό LM Studio)
+                # πρέπει να ξαναδοκιμάσει το LLM στην επόμενη ανάλυση
+                if result[-1]:
+                    analysis_cache[ss.file_hash] = result
+                    while len(analysis_cache) > ANALYSIS_CACHE_MAX_ENTRIES:
+                        analysis_cache.popitem(last=False)
             
-            progress_bar.progress(100)
-            progress_text.empty()
-            progress_bar.empty()
+            text, fields, extracted_data, summary, _ = result
+            ss.extracted_text = text
+            ss.dynamic_fields = fields
+            ss.agent1_extracted_data = extracted_data
+            ss.document_summary = summary
             
             st.success(f"✅ Ανάλυση ολοκληρώθηκε! Βρέθηκαν {len(fields)} πεδία, {len(extracted_data)} δεδομένα")
             st.balloons()
         
         # Show document summary if available
-        if st.session_state.get('document_summary'):
-            render_document_summary(st.session_state.document_summary)
+        if ss.get('document_summary'):
+            render_document_summary(ss.document_summary)
         
         # Show extracted text
-        if st.session_state.get('extracted_text'):
-            with st.expander("📄 Εξαγόμενο κείμενο (κλικ για προβολή)"):
-                st.text_area("Κείμενο:", st.session_state.extracted_text, height=300)
+        # Το expander στέλνει το περιεχόμενό του σε κάθε rerun ακόμα και κλειστό - το κείμενο μόνο κατ' επιλογή
+        extracted_text = ss.get('extracted_text')
+        if extracted_text and st.checkbox("📄 Εμφάνιση εξαγόμενου κειμένου"):
+            limit = CONFIG.TEXT_PREVIEW_CHARS
+            st.text_area("Κείμενο:", extracted_text[:limit], height=300)
+            if len(extracted_text) > limit:
+                st.caption(f"Εμφανίζονται οι πρώτοι {limit} από {len(extracted_text)} χαρακτήρες")
+                st.download_button(
+                    "💾 Κατέβασμα πλήρους κειμένου",
+                    extracted_text,
+                    file_name="extracted_text.txt",
+                    mime="text/plain"
+                )
     
     with main_tabs[1]:
         render_user_profile_tab()
     
     with main_tabs[2]:
-        if st.session_state.get('dynamic_fields'):
+        if ss.get('dynamic_fields'):
             render_form_filler_tab()
         else:
             st.info("📋 Πήγαινε πρώτα στην καρτέλα 'Ανάλυση Εγγράφου' για να αναλύσεις ένα έγγραφο.")